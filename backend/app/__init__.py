@@ -14,7 +14,19 @@ load_dotenv()
 # Initialize extensions
 jwt = JWTManager()
 mail = Mail()
-celery = Celery(__name__)
+celery = Celery(
+    __name__,
+    broker=os.getenv('REDIS_URL', 'redis://localhost:6379'),
+    backend=os.getenv('REDIS_URL', 'redis://localhost:6379'),
+    include=['app.tasks']
+)
+# Set at import time: `celery -A app.celery worker --beat` never calls create_app
+celery.conf.beat_schedule = {
+    'expire-export-jobs': {
+        'task': 'exports.expire_export_jobs',
+        'schedule': 3600.0
+    }
+}
 socketio = SocketIO(cors_allowed_origins="*")
 
 def create_app():
@@ -29,6 +41,14 @@ def create_app():
     # Database configuration
     app.config['MONGODB_HOST'] = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/invoice_app')
     
+    # Redis configuration
+    app.config['REDIS_URL'] = os.getenv('REDIS_URL', 'redis://localhost:6379')
+    app.config['REPORT_CACHE_TTL'] = int(os.getenv('REPORT_CACHE_TTL', 300))
+    app.config['COUNT_CACHE_TTL'] = int(os.getenv('COUNT_CACHE_TTL', 60))
+    
+    # Report engine: 'aggregation' (MongoDB) or 'numpy' (in-process analytics)
+    app.config['REPORT_ENGINE'] = os.getenv('REPORT_ENGINE', 'aggregation')
+    
     # Email configuration
     app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
     app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
@@ -41,6 +61,22 @@ def create_app():
     app.config['STRIPE_SECRET_KEY'] = os.getenv('STRIPE_SECRET_KEY')
     app.config['STRIPE_WEBHOOK_SECRET'] = os.getenv('STRIPE_WEBHOOK_SECRET')
     
+    # Generated files (exports, PDFs): 'local' or 's3'
+    app.config['ARTIFACT_STORAGE'] = os.getenv('ARTIFACT_STORAGE', 'local')
+    app.config['ARTIFACT_STORAGE_DIR'] = os.getenv('ARTIFACT_STORAGE_DIR', os.path.join(app.instance_path, 'artifacts'))
+    app.config['AWS_S3_BUCKET'] = os.getenv('AWS_S3_BUCKET')
+    app.config['AWS_S3_REGION'] = os.getenv('AWS_S3_REGION', 'us-east-1')
+    app.config['EXPORT_RETENTION_HOURS'] = int(os.getenv('EXPORT_RETENTION_HOURS', 24))
+    
+    # Rendered invoice PDFs, cached on local disk by content hash
+    app.config['PDF_CACHE_DIR'] = os.getenv('PDF_CACHE_DIR', os.path.join(app.config['ARTIFACT_STORAGE_DIR'], 'pdf-cache'))
+    app.config['PDF_CACHE_MAX_BYTES'] = int(os.getenv('PDF_CACHE_MAX_BYTES', 1024 ** 3))
+    app.config['PDF_RENDER_WAIT'] = float(os.getenv('PDF_RENDER_WAIT', 5))
+    app.config['PDF_ARCHIVE_WORKERS'] = int(os.getenv('PDF_ARCHIVE_WORKERS', 2))
+    # send_file, or x-accel to let the nginx proxy serve cached PDFs
+    app.config['PDF_DELIVERY'] = os.getenv('PDF_DELIVERY', 'send_file')
+    app.config['PDF_ACCEL_PREFIX'] = os.getenv('PDF_ACCEL_PREFIX', '/_pdf-cache/')
+    
     # PayPal configuration
     app.config['PAYPAL_CLIENT_ID'] = os.getenv('PAYPAL_CLIENT_ID')
     app.config['PAYPAL_CLIENT_SECRET'] = os.getenv('PAYPAL_CLIENT_SECRET')
@@ -63,10 +99,21 @@ def create_app():
     
     # Configure Celery
     celery.conf.update(
-        broker_url=os.getenv('REDIS_URL', 'redis://localhost:6379'),
-        result_backend=os.getenv('REDIS_URL', 'redis://localhost:6379')
+        broker_url=app.config['REDIS_URL'],
+        result_backend=app.config['REDIS_URL']
     )
     
+    # Initialize artifact storage
+    from .services.storage_service import artifact_storage
+    artifact_storage.init_app(app)
+    from .services.pdf_service import pdf_service
+    pdf_service.init_app(app)
+    
+    # Initialize report cache
+    from .services.cache_service import report_cache, count_cache
+    report_cache.init_app(app)
+    count_cache.init_app(app)
+    
     # Initialize notification service and register socket events
     from .services.notification_service import NotificationService, register_socket_events
     notification_service = NotificationService(socketio)
@@ -89,6 +136,10 @@ def create_app():
     app.register_blueprint(notifications_bp, url_prefix='/api/notifications')
     app.register_blueprint(languages_bp, url_prefix='/api/languages')
     
+    # Register CLI commands
+    from .commands import register_commands
+    register_commands(app)
+    
     # Make socketio available globally
     app.socketio = socketio
     
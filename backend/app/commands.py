@@ -0,0 +1,83 @@
+import click
+from flask.cli import AppGroup
+
+rollups_cli = AppGroup('rollups', help='Maintain the daily revenue rollups.')
+
+@rollups_cli.command('rebuild')
+@click.option('--user', 'user_id', default=None, help='Only rebuild rollups for this user id.')
+def rebuild_rollups(user_id):
+    """Backfill or rebuild revenue rollups from raw invoices"""
+    from .services.rollup_service import revenue_rollup_service
+    buckets = revenue_rollup_service.rebuild(user_id)
+    click.echo(f'Rebuilt {buckets} revenue rollup buckets')
+
+@rollups_cli.command('check')
+@click.option('--user', 'user_id', default=None, help='Only check rollups for this user id.')
+def check_rollups(user_id):
+    """Compare revenue rollups with raw invoices; exits 1 on drift"""
+    from .services.rollup_service import revenue_rollup_service
+    mismatches = revenue_rollup_service.check_consistency(user_id)
+    for mismatch in mismatches:
+        click.echo(
+            f"{mismatch['user_id']} {mismatch['day']} {mismatch['currency']} {mismatch['status']}: "
+            f"expected {mismatch['expected']}, found {mismatch['actual']}"
+        )
+    if mismatches:
+        raise click.ClickException(f'{len(mismatches)} rollup buckets are inconsistent')
+    click.echo('Revenue rollups are consistent')
+
+indexes_cli = AppGroup('indexes', help='Check that queries are served by indexes.')
+
+@indexes_cli.command('check')
+@click.option('--user', 'user_id', default=None, help='Explain the query shapes for this user id.')
+def check_indexes(user_id):
+    """Explain the API query shapes; exits 1 on collection scans, in-memory sorts or index intersections"""
+    from .services.index_advisor import index_advisor
+    for collection, drift in index_advisor.index_drift().items():
+        click.echo(f"{collection}: missing {drift['missing']}, undeclared {drift['extra']}")
+
+    flagged = 0
+    for result in index_advisor.check(user_id):
+        status = 'FLAG' if result['problems'] else 'ok'
+        detail = ', '.join(result['problems']) or ', '.join(result['indexes'])
+        click.echo(f"{status:4} {result['name']}: {' > '.join(result['stages'])} ({detail})")
+        flagged += bool(result['problems'])
+    if flagged:
+        raise click.ClickException(f'{flagged} query shapes are not fully served by an index')
+    click.echo('Every query shape is served by an index')
+
+@indexes_cli.command('sync')
+def sync_indexes():
+    """Create declared indexes and drop the ones models no longer declare"""
+    from .services.index_advisor import index_advisor
+    dropped = index_advisor.sync()
+    click.echo(f'Indexes are in sync ({dropped} undeclared indexes dropped)')
+
+pdfs_cli = AppGroup('pdfs', help='Manage the rendered invoice PDF cache.')
+
+@pdfs_cli.command('evict')
+def evict_pdfs():
+    """Delete least recently used cached PDFs above PDF_CACHE_MAX_BYTES"""
+    from .services.pdf_service import pdf_service
+    removed, freed = pdf_service.evict()
+    click.echo(f'Evicted {removed} cached PDFs ({freed} bytes)')
+
+@pdfs_cli.command('render-batch')
+@click.option('--user', 'user_id', default=None, help='Only render invoices of this user id.')
+@click.option('--from', 'issued_from', type=click.DateTime(), default=None, help='Issued on or after this date.')
+@click.option('--to', 'issued_to', type=click.DateTime(), default=None, help='Issued before this date.')
+@click.option('--workers', type=int, default=None, help='Render processes (default: one per CPU).')
+def render_batch_pdfs(user_id, issued_from, issued_to, workers):
+    """Render invoice PDFs into the cache on a process pool"""
+    from .services.pdf_service import pdf_service
+    invoice_ids = pdf_service.batch_ids(user_id, issued_from, issued_to)
+    stats = pdf_service.render_batch(invoice_ids, workers)
+    click.echo(f"Rendered {stats['rendered']} PDFs, {stats['cached']} already cached, {stats['failed']} failed")
+    if stats['failed']:
+        raise click.ClickException(f"{stats['failed']} invoices failed to render")
+
+def register_commands(app):
+    """Register CLI command groups on the app"""
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(indexes_cli)
+    app.cli.add_command(pdfs_cli)
@@ -3,5 +3,8 @@ from .client import Client
 from .invoice import Invoice, InvoiceItem
 from .payment import Payment
 from .notification import Notification
+from .revenue_rollup import RevenueRollup
+from .export_job import ExportJob
+from .invoice_counter import InvoiceCounter
 
-__all__ = ['User', 'Client', 'Invoice', 'InvoiceItem', 'Payment', 'Notification']
+__all__ = ['User', 'Client', 'Invoice', 'InvoiceItem', 'Payment', 'Notification', 'RevenueRollup', 'ExportJob', 'InvoiceCounter']
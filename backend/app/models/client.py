@@ -1,5 +1,6 @@
 from mongoengine import Document, StringField, EmailField, DateTimeField, BooleanField, ReferenceField, ListField
 from datetime import datetime
+from .utils import reference_id
 
 class Client(Document):
     user = ReferenceField('User', required=True)
@@ -38,14 +39,16 @@ class Client(Document):
             'user',
             'company_name',
             'email',
-            'tags'
+            'tags',
+            # Keyset pagination of client listings
+            ('user', 'is_active', 'company_name', 'id')
         ]
     }
     
     def to_dict(self):
         return {
             'id': str(self.id),
-            'user_id': str(self.user.id),
+            'user_id': str(reference_id(self, 'user')),
             'company_name': self.company_name,
             'contact_person': self.contact_person,
             'email': self.email,
@@ -68,6 +71,22 @@ class Client(Document):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
     
+    # Fields shown in reports; changing them (e.g. a soft delete) invalidates cached reports
+    REPORT_FIELDS = {'is_active', 'company_name', 'contact_person', 'email'}
+    
     def save(self, *args, **kwargs):
         self.updated_at = datetime.utcnow()
-        return super().save(*args, **kwargs)
+        
+        from ..services.cache_service import report_cache, count_cache
+        invalidate = not self._created and bool(self.REPORT_FIELDS & set(self._get_changed_fields()))
+        result = super().save(*args, **kwargs)
+        if invalidate:
+            report_cache.invalidate(reference_id(self, 'user'))
+        count_cache.invalidate(reference_id(self, 'user'), 'clients')
+        return result
+    
+    def delete(self, *args, **kwargs):
+        from ..services.cache_service import count_cache
+        result = super().delete(*args, **kwargs)
+        count_cache.invalidate(reference_id(self, 'user'), 'clients')
+        return result
@@ -0,0 +1,70 @@
+from mongoengine import Document, StringField, DateTimeField, ReferenceField, IntField
+from datetime import datetime
+
+class ExportJob(Document):
+    """Background report export run by a Celery task"""
+
+    user = ReferenceField('User', required=True)
+    report_type = StringField(required=True, choices=['revenue', 'clients', 'invoices'])
+    format = StringField(required=True, max_length=10)
+    start_date = DateTimeField()
+    end_date = DateTimeField()
+
+    # Set while the job is pending or running so identical concurrent
+    # requests upsert onto the same job; a later request starts a fresh run
+    dedupe_key = StringField()
+    token = StringField(required=True)
+
+    # Progress
+    status = StringField(choices=['pending', 'running', 'completed', 'failed', 'expired'], default='pending')
+    task_id = StringField()
+    rows_written = IntField(default=0)
+    total_rows = IntField()
+    error_message = StringField(max_length=500)
+
+    # Artifact
+    artifact_location = StringField()
+    artifact_size = IntField()
+
+    created_at = DateTimeField(default=datetime.utcnow)
+    started_at = DateTimeField()
+    completed_at = DateTimeField()
+    expires_at = DateTimeField()
+
+    meta = {
+        'collection': 'export_jobs',
+        'indexes': [
+            {'fields': ['dedupe_key'], 'unique': True, 'sparse': True},
+            ('user', 'created_at'),
+            ('status', 'expires_at')
+        ]
+    }
+
+    @property
+    def filename(self):
+        return f'{self.report_type}_report_{self.id}.{self.format}'
+
+    def to_dict(self):
+        progress = None
+        if self.status == 'completed':
+            progress = 100.0
+        elif self.total_rows:
+            progress = round(min(self.rows_written / self.total_rows, 1) * 100, 1)
+
+        return {
+            'id': str(self.id),
+            'report_type': self.report_type,
+            'format': self.format,
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'status': self.status,
+            'rows_written': self.rows_written,
+            'total_rows': self.total_rows,
+            'progress': progress,
+            'error_message': self.error_message,
+            'artifact_size': self.artifact_size,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
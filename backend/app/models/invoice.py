@@ -1,6 +1,7 @@
-from mongoengine import Document, StringField, DateTimeField, BooleanField, ReferenceField, ListField, DecimalField, IntField, EnumField
+from mongoengine import QuerySet, OperationError, Document, EmbeddedDocument, EmbeddedDocumentField, StringField, DateTimeField, BooleanField, ReferenceField, ListField, DecimalField, IntField
 from datetime import datetime
 from decimal import Decimal
+from .utils import reference_id
 
 class InvoiceItem(EmbeddedDocument):
     description = StringField(required=True, max_length=200)
@@ -24,10 +25,68 @@ class InvoiceItem(EmbeddedDocument):
     @property
     def total(self):
         return self.subtotal - self.discount_amount + self.tax_amount
+    
+    def to_dict(self):
+        return {
+            'description': self.description,
+            'quantity': float(self.quantity),
+            'unit_price': float(self.unit_price),
+            'tax_rate': float(self.tax_rate),
+            'discount_rate': float(self.discount_rate),
+            'subtotal': float(self.subtotal),
+            'discount_amount': float(self.discount_amount),
+            'tax_amount': float(self.tax_amount),
+            'total': float(self.total)
+        }
+
+class InvoiceQuerySet(QuerySet):
+    """Keeps bulk writes from bypassing the revenue rollups: deletes go
+    through Invoice.delete, and updates may not touch rollup fields"""
+
+    def delete(self, write_concern=None, _from_doc_delete=False, cascade_refs=None):
+        if _from_doc_delete:
+            return super().delete(write_concern, _from_doc_delete, cascade_refs)
+        deleted = 0
+        for invoice in self.clone():
+            invoice.delete()
+            deleted += 1
+        return deleted
+
+    def _check_untracked(self, update):
+        from ..services.rollup_service import revenue_rollup_service
+        raw = update.get('__raw__') or {}
+        names = set()
+        for key in update:
+            names.update(key.split('__'))
+        for fields in raw.values():
+            if isinstance(fields, dict):
+                names.update(name.split('.')[0] for name in fields)
+        tracked = names & revenue_rollup_service.TRACKED_FIELDS
+        if tracked:
+            raise OperationError(
+                f"Bulk updates of {', '.join(sorted(tracked))} would skip the revenue rollups; "
+                "save the invoices or use InvoiceService.transition_invoices"
+            )
+
+    def update(self, *args, **update):
+        self._check_untracked(update)
+        return super().update(*args, **update)
+
+    def update_one(self, *args, **update):
+        self._check_untracked(update)
+        return super().update_one(*args, **update)
+
+    def upsert_one(self, *args, **update):
+        self._check_untracked(update)
+        return super().upsert_one(*args, **update)
+
+    def modify(self, *args, **update):
+        self._check_untracked(update)
+        return super().modify(*args, **update)
 
 class Invoice(Document):
     # Basic information
-    invoice_number = StringField(required=True, unique=True)
+    invoice_number = StringField(required=True)
     user = ReferenceField('User', required=True)
     client = ReferenceField('Client', required=True)
     
@@ -38,7 +97,7 @@ class Invoice(Document):
     paid_date = DateTimeField()
     
     # Status
-    status = EnumField('InvoiceStatus', choices=['draft', 'sent', 'paid', 'overdue', 'cancelled'], default='draft')
+    status = StringField(choices=['draft', 'sent', 'paid', 'overdue', 'cancelled'], default='draft')
     
     # Financial information
     currency = StringField(required=True, max_length=3, default='EUR')
@@ -71,15 +130,29 @@ class Invoice(Document):
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow)
     
+    # to_dict keys returned by list views unless `fields=` asks for others;
+    # items, notes and terms are left to the detail view
+    LIST_FIELDS = (
+        'invoice_number', 'client_id', 'client', 'issue_date', 'due_date', 'status', 'currency',
+        'total_amount', 'paid_amount', 'balance_due', 'created_at'
+    )
+    
     meta = {
         'collection': 'invoices',
+        'queryset_class': InvoiceQuerySet,
+        # Every query is scoped to a user, so indexes lead with it and end in
+        # the sort or range field; `flask indexes check` explains the shapes
         'indexes': [
-            'invoice_number',
-            'user',
-            'client',
-            'status',
-            'issue_date',
-            'due_date'
+            # Numbers come from a per-user counter and are unique per user
+            {'fields': ('user', 'invoice_number'), 'unique': True},
+            # Reports and exports over an issue_date range; covers the top-clients group by client
+            ('user', 'issue_date', 'client', 'total_amount', 'paid_amount'),
+            # Accounts-receivable aging: open invoices by status and due date
+            ('user', 'status', 'due_date'),
+            # Keyset pagination of invoice listings, optionally by status or client
+            ('user', '-created_at', '-id'),
+            ('user', 'status', '-created_at', '-id'),
+            ('user', 'client', '-created_at', '-id')
         ]
     }
     
@@ -116,8 +189,8 @@ class Invoice(Document):
         return {
             'id': str(self.id),
             'invoice_number': self.invoice_number,
-            'user_id': str(self.user.id),
-            'client_id': str(self.client.id),
+            'user_id': str(reference_id(self, 'user')),
+            'client_id': str(reference_id(self, 'client')),
             'issue_date': self.issue_date.isoformat() if self.issue_date else None,
             'due_date': self.due_date.isoformat() if self.due_date else None,
             'sent_date': self.sent_date.isoformat() if self.sent_date else None,
@@ -130,17 +203,7 @@ class Invoice(Document):
             'total_amount': float(self.total_amount),
             'paid_amount': float(self.paid_amount),
             'balance_due': float(self.balance_due),
-            'items': [{
-                'description': item.description,
-                'quantity': float(item.quantity),
-                'unit_price': float(item.unit_price),
-                'tax_rate': float(item.tax_rate),
-                'discount_rate': float(item.discount_rate),
-                'subtotal': float(item.subtotal),
-                'discount_amount': float(item.discount_amount),
-                'tax_amount': float(item.tax_amount),
-                'total': float(item.total)
-            } for item in self.items],
+            'items': [item.to_dict() for item in self.items],
             'shipping_fee': float(self.shipping_fee),
             'handling_fee': float(self.handling_fee),
             'notes': self.notes,
@@ -154,4 +217,39 @@ class Invoice(Document):
     
     def save(self, *args, **kwargs):
         self.updated_at = datetime.utcnow()
-        return super().save(*args, **kwargs)
+        
+        # Keep the daily revenue rollups in step with this invoice
+        from ..services.rollup_service import revenue_rollup_service
+        from ..services.cache_service import report_cache, count_cache
+        if not revenue_rollup_service.needs_update(self):
+            result = super().save(*args, **kwargs)
+        else:
+            previous = None
+            if not self._created:
+                # Validate before the swap writes anything
+                if kwargs.get('validate', True):
+                    self.validate(clean=kwargs.get('clean', True))
+                    kwargs['validate'] = False
+                # Tracked fields are written atomically by the swap; the
+                # regular save only writes the rest
+                previous = revenue_rollup_service.swap(self)
+                self._changed_fields = [
+                    field for field in self._changed_fields
+                    if field not in revenue_rollup_service.TRACKED_FIELDS
+                ]
+            result = super().save(*args, **kwargs)
+            revenue_rollup_service.record(previous, self)
+        
+        report_cache.invalidate(reference_id(self, 'user'))
+        count_cache.invalidate(reference_id(self, 'user'), 'invoices')
+        return result
+    
+    def delete(self, *args, **kwargs):
+        from ..services.rollup_service import revenue_rollup_service
+        from ..services.cache_service import report_cache, count_cache
+        previous = revenue_rollup_service.take(self.pk)
+        result = super().delete(*args, **kwargs)
+        revenue_rollup_service.apply(previous, None)
+        report_cache.invalidate(reference_id(self, 'user'))
+        count_cache.invalidate(reference_id(self, 'user'), 'invoices')
+        return result
@@ -0,0 +1,35 @@
+from mongoengine import Document, StringField, ReferenceField, IntField
+
+class InvoiceCounter(Document):
+    """Last invoice number issued per (user, prefix).
+
+    Incremented atomically with `find_one_and_update` by
+    InvoiceService.generate_invoice_number, so concurrent creates never
+    hand out the same number.
+    """
+
+    user = ReferenceField('User', required=True)
+    prefix = StringField(required=True, max_length=10)
+    value = IntField(default=0)
+
+    meta = {
+        'collection': 'invoice_counters',
+        'indexes': [
+            {'fields': ('user', 'prefix'), 'unique': True}
+        ]
+    }
+
+    @classmethod
+    def seed_value(cls, user, prefix):
+        """Last number issued with a prefix before it had a counter: the
+        user's `next_invoice_number` seed or the highest existing number,
+        read with one sorted query on the (user, invoice_number) index.
+        Numbers are zero-padded to four digits, so they sort as strings."""
+        from .invoice import Invoice
+
+        last = int(user.next_invoice_number or 1) - 1
+        highest = Invoice.objects(user=user.pk, invoice_number__startswith=f'{prefix}-').order_by(
+            '-invoice_number'
+        ).only('invoice_number').as_pymongo().first()
+        suffix = highest['invoice_number'][len(prefix) + 1:] if highest else ''
+        return max(last, int(suffix)) if suffix.isdigit() else last
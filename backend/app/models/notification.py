@@ -1,5 +1,6 @@
 from mongoengine import Document, StringField, BooleanField, DateTimeField, DictField, ReferenceField
 from datetime import datetime
+from .utils import reference_id
 
 class Notification(Document):
     """Notification model for user notifications"""
@@ -17,18 +18,31 @@ class Notification(Document):
     meta = {
         'collection': 'notifications',
         'indexes': [
-            'user',
-            'is_read',
+            # Cleanup of old notifications across users
             'created_at',
-            ('user', 'is_read'),
-            ('user', 'created_at')
+            # Keyset pagination, optionally unread only; also serves unread counts
+            ('user', '-created_at', '-id'),
+            ('user', 'is_read', '-created_at', '-id')
         ],
         'ordering': ['-created_at']
     }
     
     def save(self, *args, **kwargs):
         self.updated_at = datetime.utcnow()
-        return super().save(*args, **kwargs)
+        
+        # Totals only change when a notification is added or (un)read
+        from ..services.cache_service import count_cache
+        invalidate = self._created or 'is_read' in self._get_changed_fields()
+        result = super().save(*args, **kwargs)
+        if invalidate:
+            count_cache.invalidate(reference_id(self, 'user'), 'notifications')
+        return result
+    
+    def delete(self, *args, **kwargs):
+        from ..services.cache_service import count_cache
+        result = super().delete(*args, **kwargs)
+        count_cache.invalidate(reference_id(self, 'user'), 'notifications')
+        return result
     
     def to_dict(self):
         """Convert notification to dictionary"""
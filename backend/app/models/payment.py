@@ -1,6 +1,7 @@
-from mongoengine import Document, StringField, DateTimeField, BooleanField, ReferenceField, DecimalField, EnumField
+from mongoengine import Document, StringField, DateTimeField, BooleanField, ReferenceField, DecimalField
 from datetime import datetime
 from decimal import Decimal
+from .utils import reference_id
 
 class Payment(Document):
     # Basic information
@@ -15,7 +16,7 @@ class Payment(Document):
     payment_method = StringField(required=True, max_length=50)  # stripe, paypal, bank_transfer, etc.
     
     # Status
-    status = EnumField('PaymentStatus', choices=['pending', 'processing', 'completed', 'failed', 'cancelled', 'refunded'], default='pending')
+    status = StringField(choices=['pending', 'processing', 'completed', 'failed', 'cancelled', 'refunded'], default='pending')
     
     # Provider information
     provider = StringField(required=True, max_length=50)  # stripe, paypal, etc.
@@ -41,12 +42,11 @@ class Payment(Document):
         'collection': 'payments',
         'indexes': [
             'payment_id',
-            'invoice',
-            'user',
-            'client',
-            'status',
-            'provider',
-            'created_at'
+            # Payments of an invoice, newest first
+            ('invoice', '-created_at'),
+            # Completed payments in a date range (dashboard)
+            ('user', 'status', 'created_at'),
+            'provider_payment_id'
         ]
     }
     
@@ -106,4 +106,7 @@ class Payment(Document):
         }
     
     def save(self, *args, **kwargs):
-        return super().save(*args, **kwargs)
+        from ..services.cache_service import report_cache
+        result = super().save(*args, **kwargs)
+        report_cache.invalidate(reference_id(self, 'user'))
+        return result
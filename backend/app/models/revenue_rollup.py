@@ -0,0 +1,38 @@
+from mongoengine import Document, StringField, DateTimeField, ReferenceField, DecimalField, IntField
+
+class RevenueRollup(Document):
+    """Daily invoice totals per (user, day, currency, status).
+
+    Maintained incrementally with `$inc` by RevenueRollupService whenever an
+    invoice is saved or deleted, so reports can read at most one small
+    document per day instead of scanning raw invoices.
+    """
+
+    user = ReferenceField('User', required=True)
+    day = DateTimeField(required=True)  # issue_date truncated to midnight UTC
+    currency = StringField(required=True, max_length=3)
+    status = StringField(required=True)
+
+    invoice_count = IntField(default=0)
+    total_amount = DecimalField(precision=2, default=0.0)
+    paid_amount = DecimalField(precision=2, default=0.0)
+    balance_due = DecimalField(precision=2, default=0.0)
+
+    meta = {
+        'collection': 'revenue_rollups',
+        'indexes': [
+            {'fields': ('user', 'day', 'currency', 'status'), 'unique': True}
+        ]
+    }
+
+    def to_dict(self):
+        return {
+            'user_id': str(self.user.id),
+            'day': self.day.date().isoformat(),
+            'currency': self.currency,
+            'status': self.status,
+            'invoice_count': self.invoice_count,
+            'total_amount': float(self.total_amount),
+            'paid_amount': float(self.paid_amount),
+            'balance_due': float(self.balance_due)
+        }
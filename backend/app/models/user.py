@@ -25,7 +25,7 @@ class User(Document):
     default_currency = StringField(default='EUR', max_length=3)
     default_tax_rate = StringField(default='20.0')
     invoice_prefix = StringField(default='INV', max_length=10)
-    next_invoice_number = StringField(default='0001')
+    next_invoice_number = StringField(default='0001')  # where a new prefix's counter starts
     
     # Payment settings
     stripe_enabled = BooleanField(default=False)
@@ -70,7 +70,6 @@ class User(Document):
             'default_currency': self.default_currency,
             'default_tax_rate': self.default_tax_rate,
             'invoice_prefix': self.invoice_prefix,
-            'next_invoice_number': self.next_invoice_number,
             'stripe_enabled': self.stripe_enabled,
             'paypal_enabled': self.paypal_enabled,
             'preferred_language': self.preferred_language,
@@ -0,0 +1,10 @@
+from bson import DBRef
+
+def reference_id(document, field_name):
+    """Return the id stored in a ReferenceField without dereferencing it"""
+    value = document._data.get(field_name)
+    if value is None:
+        return None
+    if isinstance(value, DBRef):
+        return value.id
+    return getattr(value, 'pk', value)
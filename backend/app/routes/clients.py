@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import Client, User
+from ..services.pagination import paginate, list_total, page_count
+from ..services.serializer_service import raw_serializer
+from ..services.etags import make_etag, row_versions, not_modified, with_etag
 
 clients_bp = Blueprint('clients', __name__)
 
@@ -14,6 +17,8 @@ def get_clients():
         # Get query parameters
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 'estimate')
         search = request.args.get('search', '')
         tags = request.args.get('tags', '')
         
@@ -31,22 +36,35 @@ def get_clients():
             tag_list = [tag.strip() for tag in tags.split(',')]
             query['tags__in'] = tag_list
         
-        # Get clients with pagination
-        clients = Client.objects(**query).order_by('company_name').skip((page - 1) * per_page).limit(per_page)
-        total = Client.objects(**query).count()
+        # Get clients with pagination (keyset when a cursor is given)
+        clients, next_cursor = paginate(
+            Client.objects(**query).as_pymongo(), 'company_name', per_page, page=page, cursor=cursor
+        )
+        total = list_total(Client.objects(**query), include_total, current_user_id, 'clients', query)
         
-        client_list = [client.to_dict() for client in clients]
+        # Answer 304 from the page's versions before serializing anything
+        etag = make_etag(
+            'clients', current_user_id, request.args.to_dict(flat=False), total, next_cursor, row_versions(clients)
+        )
+        cached = not_modified(etag)
+        if cached:
+            return cached
         
-        return jsonify({
+        client_list = raw_serializer.serialize_many('client', clients)
+        
+        return with_etag(raw_serializer.response({
             'clients': client_list,
             'pagination': {
-                'page': page,
+                'page': page if cursor is None else None,
                 'per_page': per_page,
                 'total': total,
-                'pages': (total + per_page - 1) // per_page
+                'pages': page_count(total, per_page),
+                'next_cursor': next_cursor
             }
-        }), 200
+        }), etag)
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -57,13 +75,18 @@ def get_client(client_id):
     try:
         current_user_id = get_jwt_identity()
         
-        client = Client.objects(id=client_id, user=current_user_id).first()
+        client = Client.objects(id=client_id, user=current_user_id).as_pymongo().first()
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
-        return jsonify({
-            'client': client.to_dict()
-        }), 200
+        etag = make_etag(client['_id'], client.get('updated_at'))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        return with_etag(raw_serializer.response({
+            'client': raw_serializer.serialize('client', client)
+        }), etag)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,13 +1,21 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, url_for, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 from decimal import Decimal
+from bson import ObjectId
+from mongoengine import ValidationError
 from ..models import Invoice, InvoiceItem, User, Client
 from ..services.invoice_service import InvoiceService
+from ..services.pagination import paginate, list_total, page_count
+from ..services.serializer_service import raw_serializer
+from ..services.etags import make_etag, row_versions, not_modified, with_etag
+from ..services.pdf_service import pdf_service
 
 invoices_bp = Blueprint('invoices', __name__)
 invoice_service = InvoiceService()
 
+BULK_LIMIT = 5000
+
 @invoices_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_invoices():
@@ -18,6 +26,9 @@ def get_invoices():
         # Get query parameters
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 'estimate')
+        fields = invoice_service.list_fields(request.args.get('fields'))
         status = request.args.get('status')
         client_id = request.args.get('client_id')
         start_date = request.args.get('start_date')
@@ -34,25 +45,55 @@ def get_invoices():
         if end_date:
             query['issue_date__lte'] = datetime.fromisoformat(end_date)
         
-        # Get invoices with pagination
-        invoices = Invoice.objects(**query).order_by('-created_at').skip((page - 1) * per_page).limit(per_page)
-        total = Invoice.objects(**query).count()
+        # Get invoices with pagination (keyset when a cursor is given)
+        invoices, next_cursor = paginate(
+            invoice_service.list_queryset(Invoice.objects(**query), fields),
+            'created_at', per_page, page=page, cursor=cursor, descending=True
+        )
+        total = list_total(Invoice.objects(**query), include_total, current_user_id, 'invoices', query)
+        clients = invoice_service.load_row_clients(invoices, fields)
         
-        # Get client details for each invoice
-        invoice_list = []
-        for invoice in invoices:
-            invoice_data = invoice.to_dict()
-            invoice_data['client'] = invoice.client.to_dict() if invoice.client else None
-            invoice_list.append(invoice_data)
+        # Answer 304 from the page's versions before serializing anything
+        etag = make_etag(
+            'invoices', current_user_id, request.args.to_dict(flat=False), total, next_cursor,
+            row_versions(invoices), row_versions(clients.values())
+        )
+        cached = not_modified(etag)
+        if cached:
+            return cached
         
-        return jsonify({
+        # Only the requested fields are read; clients are loaded in one query
+        invoice_list = invoice_service.serialize_invoice_rows(invoices, fields, clients)
+        
+        return with_etag(raw_serializer.response({
             'invoices': invoice_list,
             'pagination': {
-                'page': page,
+                'page': page if cursor is None else None,
                 'per_page': per_page,
                 'total': total,
-                'pages': (total + per_page - 1) // per_page
+                'pages': page_count(total, per_page),
+                'next_cursor': next_cursor
             }
+        }), etag)
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@invoices_bp.route('/next-number', methods=['GET'])
+@jwt_required()
+def get_next_invoice_number():
+    """Get the number the next created invoice will get"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        user = User.objects(id=current_user_id).only('invoice_prefix', 'next_invoice_number').first()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        return jsonify({
+            'invoice_number': invoice_service.next_invoice_number(user)
         }), 200
         
     except Exception as e:
@@ -65,16 +106,20 @@ def get_invoice(invoice_id):
     try:
         current_user_id = get_jwt_identity()
         
-        invoice = Invoice.objects(id=invoice_id, user=current_user_id).first()
+        invoice = Invoice.objects(id=invoice_id, user=current_user_id).as_pymongo().first()
         if not invoice:
             return jsonify({'error': 'Invoice not found'}), 404
         
-        invoice_data = invoice.to_dict()
-        invoice_data['client'] = invoice.client.to_dict() if invoice.client else None
+        clients = invoice_service.load_row_clients([invoice])
+        client = clients.get(invoice.get('client'))
+        etag = make_etag(invoice['_id'], invoice.get('updated_at'), client.get('updated_at') if client else None)
+        cached = not_modified(etag)
+        if cached:
+            return cached
         
-        return jsonify({
-            'invoice': invoice_data
-        }), 200
+        return with_etag(raw_serializer.response({
+            'invoice': invoice_service.serialize_invoice_rows([invoice], clients=clients)[0]
+        }), etag)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -107,42 +152,11 @@ def create_invoice():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        # Generate invoice number
+        # Generate invoice number and build the invoice with its totals
         invoice_number = invoice_service.generate_invoice_number(user)
-        
-        # Create invoice items
-        items = []
-        for item_data in data['items']:
-            item = InvoiceItem(
-                description=item_data['description'],
-                quantity=Decimal(str(item_data['quantity'])),
-                unit_price=Decimal(str(item_data['unit_price'])),
-                tax_rate=Decimal(str(item_data.get('tax_rate', 0))),
-                discount_rate=Decimal(str(item_data.get('discount_rate', 0)))
-            )
-            items.append(item)
-        
-        # Create invoice
-        invoice = Invoice(
-            invoice_number=invoice_number,
-            user=user,
-            client=client,
-            due_date=datetime.fromisoformat(data['due_date']),
-            currency=data.get('currency', user.default_currency),
-            items=items,
-            notes=data.get('notes', ''),
-            terms_conditions=data.get('terms_conditions', ''),
-            shipping_fee=Decimal(str(data.get('shipping_fee', 0))),
-            handling_fee=Decimal(str(data.get('handling_fee', 0)))
-        )
-        
-        # Calculate totals
-        invoice.calculate_totals()
+        invoice = invoice_service.build_invoice(user, client, data, invoice_number)
         invoice.save()
-        
-        # Update user's next invoice number
-        user.next_invoice_number = str(int(user.next_invoice_number) + 1).zfill(4)
-        user.save()
+        pdf_service.prerender(invoice.id)
         
         return jsonify({
             'message': 'Invoice created successfully',
@@ -152,6 +166,143 @@ def create_invoice():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@invoices_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def create_invoices_bulk():
+    """Create many invoices in one request; returns a result per row"""
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json() or {}
+        rows = data.get('invoices')
+        
+        if not isinstance(rows, list) or not rows:
+            return jsonify({'error': 'Field invoices must be a non-empty list'}), 400
+        if len(rows) > BULK_LIMIT:
+            return jsonify({'error': f'At most {BULK_LIMIT} invoices per request'}), 400
+        
+        user = User.objects(id=current_user_id).first()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        results = invoice_service.create_invoices_bulk(user, rows)
+        created = sum(1 for result in results if result['status'] == 'created')
+        
+        return raw_serializer.response({
+            'created': created,
+            'failed': len(results) - created,
+            'results': results
+        }, status=201 if created == len(results) else 207)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@invoices_bp.route('/bulk-status', methods=['POST'])
+@jwt_required()
+def transition_invoices_bulk():
+    """Cancel or mark paid many invoices and queue their notifications, or
+    queue sending many drafts (each is marked sent once its email is out)"""
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json() or {}
+        action = data.get('action')
+        invoice_ids = data.get('invoice_ids')
+        
+        if action not in invoice_service.STATUS_TRANSITIONS:
+            return jsonify({'error': f"Field action must be one of: {', '.join(invoice_service.STATUS_TRANSITIONS)}"}), 400
+        if not isinstance(invoice_ids, list) or not invoice_ids:
+            return jsonify({'error': 'Field invoice_ids must be a non-empty list'}), 400
+        if len(invoice_ids) > BULK_LIMIT:
+            return jsonify({'error': f'At most {BULK_LIMIT} invoices per request'}), 400
+        
+        user = User.objects(id=current_user_id).first()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        from ..tasks import run_status_side_effects
+        
+        if action == 'send':
+            # Emails go out first in the worker; nothing changes if it can't be queued
+            queued = invoice_service.transition_candidates(user, action, invoice_ids)
+            if queued:
+                try:
+                    run_status_side_effects.delay(action, current_user_id, queued)
+                except Exception as e:
+                    return jsonify({'error': f'Could not queue invoice emails: {str(e)}'}), 503
+            queued_set = set(queued)
+            return jsonify({
+                'action': action,
+                'queued': queued,
+                'skipped': [invoice_id for invoice_id in invoice_ids if invoice_id not in queued_set]
+            }), 202
+        
+        transitioned = invoice_service.transition_invoices(user, action, invoice_ids)
+        transitioned_set = set(transitioned)
+        result = {
+            'action': action,
+            'transitioned': transitioned,
+            'skipped': [invoice_id for invoice_id in invoice_ids if invoice_id not in transitioned_set]
+        }
+        if transitioned and invoice_service.STATUS_TRANSITIONS[action]['notification']:
+            # The status change is committed; report a queueing failure instead of failing the request
+            try:
+                run_status_side_effects.delay(action, current_user_id, transitioned)
+                result['notifications_queued'] = True
+            except Exception as e:
+                result['notifications_queued'] = False
+                result['notification_error'] = f'Could not queue notifications: {str(e)}'
+        return jsonify(result), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@invoices_bp.route('/pdf-archive', methods=['POST'])
+@jwt_required()
+def get_invoice_pdf_archive():
+    """Stream a ZIP of the PDFs of the given invoice ids, or of the
+    invoices matching a filter (status, client_id, issued_from, issued_to)"""
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json() or {}
+        invoice_ids = data.get('invoice_ids')
+        filters = data.get('filter')
+        
+        if invoice_ids is not None:
+            if not isinstance(invoice_ids, list) or not invoice_ids:
+                return jsonify({'error': 'Field invoice_ids must be a non-empty list'}), 400
+            if len(invoice_ids) > BULK_LIMIT:
+                return jsonify({'error': f'At most {BULK_LIMIT} invoice ids per request; use a filter'}), 400
+            if not all(ObjectId.is_valid(invoice_id) for invoice_id in invoice_ids):
+                return jsonify({'error': 'Invalid invoice id'}), 400
+        elif isinstance(filters, dict):
+            try:
+                invoice_ids = pdf_service.batch_ids(
+                    current_user_id,
+                    datetime.fromisoformat(filters['issued_from']) if filters.get('issued_from') else None,
+                    datetime.fromisoformat(filters['issued_to']) if filters.get('issued_to') else None,
+                    filters.get('status'),
+                    filters.get('client_id')
+                )
+            except (ValueError, ValidationError) as e:
+                return jsonify({'error': str(e)}), 400
+        else:
+            return jsonify({'error': 'Provide invoice_ids or a filter'}), 400
+        
+        if not invoice_ids:
+            return jsonify({'error': 'No invoices found'}), 404
+        
+        return Response(
+            stream_with_context(pdf_service.iter_archive(invoice_ids, current_user_id)),
+            mimetype='application/zip',
+            headers={
+                'Content-Disposition': 'attachment; filename=invoices.zip',
+                # Let the reverse proxy pass chunks through as they are built
+                'X-Accel-Buffering': 'no'
+            }
+        )
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @invoices_bp.route('/<invoice_id>', methods=['PUT'])
 @jwt_required()
 def update_invoice(invoice_id):
@@ -197,6 +348,7 @@ def update_invoice(invoice_id):
         # Recalculate totals
         invoice.calculate_totals()
         invoice.save()
+        pdf_service.prerender(invoice.id)
         
         return jsonify({
             'message': 'Invoice updated successfully',
@@ -226,6 +378,7 @@ def send_invoice(invoice_id):
         if success:
             invoice.mark_as_sent()
             invoice.save()
+            pdf_service.prerender(invoice.id)
             
             return jsonify({
                 'message': 'Invoice sent successfully'
@@ -269,20 +422,24 @@ def get_invoice_pdf(invoice_id):
     try:
         current_user_id = get_jwt_identity()
         
-        invoice = Invoice.objects(id=invoice_id, user=current_user_id).first()
-        if not invoice:
+        if not Invoice.objects(id=invoice_id, user=current_user_id).only('id').first():
             return jsonify({'error': 'Invoice not found'}), 404
         
-        # Generate PDF
-        pdf_data = invoice_service.generate_invoice_pdf(invoice)
-        
-        if pdf_data:
-            return pdf_data, 200, {
-                'Content-Type': 'application/pdf',
-                'Content-Disposition': f'attachment; filename=invoice_{invoice.invoice_number}.pdf'
-            }
-        else:
+        # Served from the PDF cache; rendered only when the invoice changed
+        pdf = pdf_service.get_or_render(invoice_id, current_user_id)
+        if not pdf:
             return jsonify({'error': 'Failed to generate PDF'}), 500
         
+        path, filename = pdf
+        if path is None:
+            # Another request or the pre-render task is still rendering it
+            response = jsonify({
+                'status': 'rendering',
+                'poll_url': url_for('invoices.get_invoice_pdf', invoice_id=invoice_id)
+            })
+            response.headers['Retry-After'] = '1'
+            return response, 202
+        return pdf_service.response(path, filename)
+        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import Notification
 from ..services.notification_service import NotificationService
+from ..services.pagination import paginate, list_total, page_count
+from ..services.cache_service import count_cache
 from ..middleware.auth import auth_required, handle_errors
 from datetime import datetime, timedelta
 
@@ -17,7 +19,9 @@ def get_notifications():
     # Get query parameters
     page = int(request.args.get('page', 1))
     per_page = int(request.args.get('per_page', 20))
+    cursor = request.args.get('cursor')
     unread_only = request.args.get('unread_only', 'false').lower() == 'true'
+    include_total = request.args.get('include_total', 'estimate')
     
     # Get notifications
     notifications = Notification.objects(user=current_user_id)
@@ -25,9 +29,13 @@ def get_notifications():
     if unread_only:
         notifications = notifications.filter(is_read=False)
     
-    # Apply pagination
-    total = notifications.count()
-    notifications = notifications.skip((page - 1) * per_page).limit(per_page)
+    # Apply pagination (keyset when a cursor is given)
+    total = list_total(
+        notifications, include_total, current_user_id, 'notifications', {'unread_only': unread_only}
+    )
+    notifications, next_cursor = paginate(
+        notifications, 'created_at', per_page, page=page, cursor=cursor, descending=True
+    )
     
     # Convert to list of dictionaries
     notification_list = [notif.to_dict() for notif in notifications]
@@ -35,10 +43,11 @@ def get_notifications():
     return jsonify({
         'notifications': notification_list,
         'pagination': {
-            'page': page,
+            'page': page if cursor is None else None,
             'per_page': per_page,
             'total': total,
-            'pages': (total + per_page - 1) // per_page
+            'pages': page_count(total, per_page),
+            'next_cursor': next_cursor
         }
     }), 200
 
@@ -85,6 +94,7 @@ def mark_all_as_read():
         is_read=True,
         read_at=datetime.utcnow()
     )
+    count_cache.invalidate(current_user_id, 'notifications')
     
     return jsonify({
         'message': f'{result} notifications marked as read'
@@ -5,6 +5,7 @@ import paypalrestsdk
 from ..models import Payment, Invoice, User
 from ..services.stripe_service import StripeService
 from ..services.paypal_service import PayPalService
+from ..services.serializer_service import raw_serializer
 
 payments_bp = Blueprint('payments', __name__)
 stripe_service = StripeService()
@@ -142,13 +143,13 @@ def get_payment(payment_id):
     try:
         current_user_id = get_jwt_identity()
         
-        payment = Payment.objects(id=payment_id, user=current_user_id).first()
+        payment = Payment.objects(id=payment_id, user=current_user_id).as_pymongo().first()
         if not payment:
             return jsonify({'error': 'Payment not found'}), 404
         
-        return jsonify({
-            'payment': payment.to_dict()
-        }), 200
+        return raw_serializer.response({
+            'payment': raw_serializer.serialize('payment', payment)
+        })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -165,12 +166,11 @@ def get_invoice_payments(invoice_id):
         if not invoice:
             return jsonify({'error': 'Invoice not found'}), 404
         
-        payments = Payment.objects(invoice=invoice_id).order_by('-created_at')
-        payment_list = [payment.to_dict() for payment in payments]
+        payments = Payment.objects(invoice=invoice_id).order_by('-created_at').as_pymongo()
         
-        return jsonify({
-            'payments': payment_list
-        }), 200
+        return raw_serializer.response({
+            'payments': raw_serializer.serialize_many('payment', payments)
+        })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
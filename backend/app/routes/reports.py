@@ -1,65 +1,57 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
-from ..models import Invoice, Payment, Client
-from decimal import Decimal
+from ..models import Client
+from ..services.report_service import ReportService
+from ..services.export_service import ExportService
+from ..services.cache_service import report_cache
+from ..services.export_job_service import export_job_service
+from ..services.storage_service import artifact_storage
+from ..models import ExportJob
+from ..middleware.auth import admin_required
 
 reports_bp = Blueprint('reports', __name__)
+report_service = ReportService()
+export_service = ExportService()
 
 @reports_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
+@report_cache.cached('dashboard')
 def get_dashboard_data():
     """Get dashboard summary data"""
     try:
         current_user_id = get_jwt_identity()
         
+        top_clients_by = request.args.get('top_clients_by', 'total_amount')
+        if top_clients_by not in report_service.TOP_CLIENT_SORTS:
+            return jsonify({'error': f"top_clients_by must be one of: {', '.join(report_service.TOP_CLIENT_SORTS)}"}), 400
+        try:
+            top_clients_limit = int(request.args.get('top_clients', 5))
+        except ValueError:
+            top_clients_limit = 0
+        if top_clients_limit < 1:
+            return jsonify({'error': 'top_clients must be a positive integer'}), 400
+        
         # Get date range (default to last 30 days)
         days = int(request.args.get('days', 30))
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        # Get invoices in date range
-        invoices = Invoice.objects(
-            user=current_user_id,
-            issue_date__gte=start_date,
-            issue_date__lte=end_date
-        )
-        
-        # Get payments in date range
-        payments = Payment.objects(
-            user=current_user_id,
-            created_at__gte=start_date,
-            created_at__lte=end_date
-        )
-        
-        # Calculate totals
-        total_invoices = invoices.count()
-        total_amount = sum(invoice.total_amount for invoice in invoices)
-        total_paid = sum(payment.amount for payment in payments if payment.status == 'completed')
-        total_pending = sum(invoice.balance_due for invoice in invoices if invoice.status in ['sent', 'draft'])
-        
-        # Get invoice status counts
-        status_counts = {}
-        for invoice in invoices:
-            status = invoice.status
-            status_counts[status] = status_counts.get(status, 0) + 1
-        
-        # Get monthly revenue data
-        monthly_revenue = get_monthly_revenue(current_user_id, days)
+        # Summary, status counts, monthly revenue and payments in one aggregation
+        dashboard = report_service.get_dashboard_summary(current_user_id, start_date, end_date)
+        dashboard['summary']['days'] = days
         
         # Get top clients
-        top_clients = get_top_clients(current_user_id, days)
+        top_clients = report_service.get_top_clients(
+            current_user_id, start_date, end_date,
+            limit=top_clients_limit,
+            sort_by=top_clients_by
+        )
         
         return jsonify({
-            'summary': {
-                'total_invoices': total_invoices,
-                'total_amount': float(total_amount),
-                'total_paid': float(total_paid),
-                'total_pending': float(total_pending),
-                'days': days
-            },
-            'status_counts': status_counts,
-            'monthly_revenue': monthly_revenue,
+            'summary': dashboard['summary'],
+            'status_counts': dashboard['status_counts'],
+            'monthly_revenue': dashboard['monthly_revenue'],
             'top_clients': top_clients
         }), 200
         
@@ -68,6 +60,7 @@ def get_dashboard_data():
 
 @reports_bp.route('/revenue', methods=['GET'])
 @jwt_required()
+@report_cache.cached('revenue')
 def get_revenue_report():
     """Get detailed revenue report"""
     try:
@@ -87,39 +80,8 @@ def get_revenue_report():
         else:
             end_date = datetime.utcnow()
         
-        # Get invoices in date range
-        invoices = Invoice.objects(
-            user=current_user_id,
-            issue_date__gte=start_date,
-            issue_date__lte=end_date
-        ).order_by('issue_date')
-        
-        # Group by month
-        monthly_data = {}
-        for invoice in invoices:
-            month_key = invoice.issue_date.strftime('%Y-%m')
-            if month_key not in monthly_data:
-                monthly_data[month_key] = {
-                    'month': month_key,
-                    'total_amount': Decimal('0.0'),
-                    'total_paid': Decimal('0.0'),
-                    'invoice_count': 0
-                }
-            
-            monthly_data[month_key]['total_amount'] += invoice.total_amount
-            monthly_data[month_key]['invoice_count'] += 1
-            
-            if invoice.status == 'paid':
-                monthly_data[month_key]['total_paid'] += invoice.total_amount
-        
-        # Convert to list and sort
-        revenue_data = list(monthly_data.values())
-        revenue_data.sort(key=lambda x: x['month'])
-        
-        # Convert Decimal to float for JSON serialization
-        for item in revenue_data:
-            item['total_amount'] = float(item['total_amount'])
-            item['total_paid'] = float(item['total_paid'])
+        # Monthly totals from the daily revenue rollups
+        revenue_data = report_service.get_revenue_by_month(current_user_id, start_date, end_date)
         
         return jsonify({
             'revenue_data': revenue_data,
@@ -132,6 +94,7 @@ def get_revenue_report():
 
 @reports_bp.route('/clients', methods=['GET'])
 @jwt_required()
+@report_cache.cached('clients')
 def get_client_report():
     """Get client performance report"""
     try:
@@ -142,33 +105,27 @@ def get_client_report():
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
+        # Invoice totals for every client in one aggregation
+        client_totals = report_service.get_client_totals(current_user_id, start_date, end_date)
+        
         # Get all clients
-        clients = Client.objects(user=current_user_id, is_active=True)
+        clients = Client.objects(user=current_user_id, is_active=True).only(
+            'id', 'company_name', 'contact_person', 'email'
+        )
         
         client_data = []
         for client in clients:
-            # Get invoices for this client
-            invoices = Invoice.objects(
-                user=current_user_id,
-                client=client.id,
-                issue_date__gte=start_date,
-                issue_date__lte=end_date
-            )
-            
-            total_amount = sum(invoice.total_amount for invoice in invoices)
-            total_paid = sum(invoice.paid_amount for invoice in invoices)
-            invoice_count = invoices.count()
-            
-            if invoice_count > 0:
+            totals = client_totals.get(client.id)
+            if totals:
                 client_data.append({
                     'client_id': str(client.id),
                     'company_name': client.company_name,
                     'contact_person': client.contact_person,
                     'email': client.email,
-                    'total_amount': float(total_amount),
-                    'total_paid': float(total_paid),
-                    'invoice_count': invoice_count,
-                    'average_invoice': float(total_amount / invoice_count) if invoice_count > 0 else 0
+                    'total_amount': totals['total_amount'],
+                    'total_paid': totals['total_paid'],
+                    'invoice_count': totals['invoice_count'],
+                    'average_invoice': totals['total_amount'] / totals['invoice_count']
                 })
         
         # Sort by total amount
@@ -183,6 +140,37 @@ def get_client_report():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@reports_bp.route('/aging', methods=['GET'])
+@jwt_required()
+@report_cache.cached('aging')
+def get_aging_report():
+    """Get accounts-receivable aging report"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        as_of = request.args.get('as_of')
+        as_of = datetime.fromisoformat(as_of) if as_of else None
+        
+        return jsonify(report_service.get_aging_report(current_user_id, as_of)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@reports_bp.route('/cache-stats', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """Get report cache hit/miss counters (admin only)"""
+    try:
+        if request.args.get('reset', 'false').lower() == 'true':
+            report_cache.reset_stats()
+        
+        return jsonify({
+            'cache': report_cache.stats()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @reports_bp.route('/export', methods=['POST'])
 @jwt_required()
 def export_report():
@@ -201,162 +189,100 @@ def export_report():
         if end_date:
             end_date = datetime.fromisoformat(end_date)
         
-        # Generate report data based on type
-        if report_type == 'revenue':
-            report_data = generate_revenue_export(current_user_id, start_date, end_date)
-        elif report_type == 'clients':
-            report_data = generate_clients_export(current_user_id, start_date, end_date)
-        elif report_type == 'invoices':
-            report_data = generate_invoices_export(current_user_id, start_date, end_date)
-        else:
+        if report_type not in export_service.REPORT_TYPES:
             return jsonify({'error': 'Invalid report type'}), 400
+        if format_type not in export_service.FORMATS:
+            return jsonify({'error': 'Invalid export format'}), 400
         
-        # For now, return JSON. In production, you'd generate CSV/Excel files
-        return jsonify({
-            'report_data': report_data,
-            'type': report_type,
-            'format': format_type
-        }), 200
+        # Stream rows as they are read from MongoDB
+        chunks = export_service.stream(report_type, format_type, current_user_id, start_date, end_date)
+        filename = f"{report_type}_report.{format_type}"
+        
+        return Response(
+            stream_with_context(chunks),
+            mimetype=export_service.CONTENT_TYPES[format_type],
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def get_monthly_revenue(user_id, days):
-    """Get monthly revenue data for dashboard"""
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=days)
-    
-    invoices = Invoice.objects(
-        user=user_id,
-        issue_date__gte=start_date,
-        issue_date__lte=end_date
-    )
-    
-    monthly_data = {}
-    for invoice in invoices:
-        month_key = invoice.issue_date.strftime('%Y-%m')
-        if month_key not in monthly_data:
-            monthly_data[month_key] = Decimal('0.0')
-        monthly_data[month_key] += invoice.total_amount
-    
-    # Convert to list and sort
-    revenue_list = [{'month': month, 'amount': float(amount)} for month, amount in monthly_data.items()]
-    revenue_list.sort(key=lambda x: x['month'])
-    
-    return revenue_list
-
-def get_top_clients(user_id, days):
-    """Get top performing clients"""
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=days)
-    
-    # Aggregate invoices by client
-    pipeline = [
-        {'$match': {
-            'user': user_id,
-            'issue_date': {'$gte': start_date, '$lte': end_date}
-        }},
-        {'$group': {
-            '_id': '$client',
-            'total_amount': {'$sum': '$total_amount'},
-            'invoice_count': {'$sum': 1}
-        }},
-        {'$sort': {'total_amount': -1}},
-        {'$limit': 5}
-    ]
-    
-    # This would need to be implemented with proper MongoDB aggregation
-    # For now, return empty list
-    return []
-
-def generate_revenue_export(user_id, start_date, end_date):
-    """Generate revenue export data"""
-    invoices = Invoice.objects(
-        user=user_id,
-        issue_date__gte=start_date,
-        issue_date__lte=end_date
-    ).order_by('issue_date')
-    
-    export_data = []
-    for invoice in invoices:
-        export_data.append({
-            'invoice_number': invoice.invoice_number,
-            'issue_date': invoice.issue_date.isoformat(),
-            'due_date': invoice.due_date.isoformat(),
-            'client': invoice.client.company_name if invoice.client else '',
-            'status': invoice.status,
-            'subtotal': float(invoice.subtotal),
-            'tax_total': float(invoice.tax_total),
-            'total_amount': float(invoice.total_amount),
-            'paid_amount': float(invoice.paid_amount),
-            'balance_due': float(invoice.balance_due)
-        })
-    
-    return export_data
-
-def generate_clients_export(user_id, start_date, end_date):
-    """Generate clients export data"""
-    clients = Client.objects(user=user_id, is_active=True)
-    
-    export_data = []
-    for client in clients:
-        # Get invoice summary for this client
-        invoices = Invoice.objects(
-            user=user_id,
-            client=client.id
-        )
+@reports_bp.route('/export-jobs', methods=['POST'])
+@jwt_required()
+def create_export_job():
+    """Start a background export, or join an identical one already running"""
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json()
+        
+        report_type = data.get('type', 'revenue')
+        format_type = data.get('format', 'csv')
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+        
+        if report_type not in export_service.REPORT_TYPES:
+            return jsonify({'error': 'Invalid report type'}), 400
+        if format_type not in export_service.FORMATS:
+            return jsonify({'error': 'Invalid export format'}), 400
         
         if start_date:
-            invoices = invoices.filter(issue_date__gte=start_date)
+            start_date = datetime.fromisoformat(start_date)
         if end_date:
-            invoices = invoices.filter(issue_date__lte=end_date)
-        
-        total_amount = sum(invoice.total_amount for invoice in invoices)
-        total_paid = sum(invoice.paid_amount for invoice in invoices)
-        
-        export_data.append({
-            'company_name': client.company_name,
-            'contact_person': client.contact_person,
-            'email': client.email,
-            'phone': client.phone,
-            'billing_address': client.billing_address,
-            'billing_city': client.billing_city,
-            'billing_country': client.billing_country,
-            'total_amount': float(total_amount),
-            'total_paid': float(total_paid),
-            'invoice_count': invoices.count()
-        })
-    
-    return export_data
+            end_date = datetime.fromisoformat(end_date)
+        
+        job, created = export_job_service.get_or_create_job(
+            current_user_id, report_type, format_type, start_date, end_date
+        )
+        
+        if created and not export_job_service.enqueue(job):
+            return jsonify({'error': 'Could not queue export job', 'job': job.to_dict()}), 503
+        
+        return jsonify({
+            'job': job.to_dict(),
+            'created': created
+        }), 202 if created else 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@reports_bp.route('/export-jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_export_job(job_id):
+    """Get export job status and progress"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        job = ExportJob.objects(id=job_id, user=current_user_id).first()
+        if not job:
+            return jsonify({'error': 'Export job not found'}), 404
+        
+        return jsonify({
+            'job': job.to_dict()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-def generate_invoices_export(user_id, start_date, end_date):
-    """Generate invoices export data"""
-    invoices = Invoice.objects(user=user_id)
-    
-    if start_date:
-        invoices = invoices.filter(issue_date__gte=start_date)
-    if end_date:
-        invoices = invoices.filter(issue_date__lte=end_date)
-    
-    export_data = []
-    for invoice in invoices:
-        export_data.append({
-            'invoice_number': invoice.invoice_number,
-            'issue_date': invoice.issue_date.isoformat(),
-            'due_date': invoice.due_date.isoformat(),
-            'client': invoice.client.company_name if invoice.client else '',
-            'status': invoice.status,
-            'currency': invoice.currency,
-            'subtotal': float(invoice.subtotal),
-            'tax_total': float(invoice.tax_total),
-            'discount_total': float(invoice.discount_total),
-            'shipping_fee': float(invoice.shipping_fee),
-            'handling_fee': float(invoice.handling_fee),
-            'total_amount': float(invoice.total_amount),
-            'paid_amount': float(invoice.paid_amount),
-            'balance_due': float(invoice.balance_due),
-            'notes': invoice.notes,
-            'created_at': invoice.created_at.isoformat()
-        })
-    
-    return export_data
+@reports_bp.route('/export-jobs/<job_id>/download', methods=['GET'])
+@jwt_required()
+def download_export_job(job_id):
+    """Download the finished export file"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        job = ExportJob.objects(id=job_id, user=current_user_id).first()
+        if not job:
+            return jsonify({'error': 'Export job not found'}), 404
+        
+        if job.status != 'completed' or not job.artifact_location:
+            return jsonify({'error': f'Export is {job.status}', 'job': job.to_dict()}), 409
+        
+        if job.expires_at and job.expires_at <= datetime.utcnow():
+            return jsonify({'error': 'Export has expired'}), 410
+        
+        return artifact_storage.download_response(
+            job.artifact_location, job.filename, export_service.CONTENT_TYPES[job.format]
+        )
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,132 @@
+import numpy as np
+from bson import ObjectId
+from ..models import Invoice, Payment
+
+class AnalyticsService:
+    """In-process report engine over NumPy columns.
+
+    Invoices are read as projected raw documents and turned into arrays of
+    integer cents and datetime64 values, then grouped with `np.unique` and
+    `np.bincount`. Sums are exact to the cent, unlike `$sum` over the float
+    values MongoDB stores for DecimalFields.
+    """
+
+    INVOICE_FIELDS = ('issue_date', 'status', 'client', 'total_amount', 'paid_amount', 'balance_due')
+    AMOUNT_FIELDS = ('total_amount', 'paid_amount', 'balance_due')
+    PENDING_STATUSES = ['sent', 'draft']
+
+    def load_invoice_columns(self, user_id, start_date=None, end_date=None):
+        """Return a dict of equally sized column arrays for the user's invoices"""
+        invoices = Invoice.objects(user=user_id)
+        if start_date:
+            invoices = invoices.filter(issue_date__gte=start_date)
+        if end_date:
+            invoices = invoices.filter(issue_date__lte=end_date)
+
+        # Size the arrays up front (the count is index-only) and fill them
+        # straight from the cursor instead of materializing every document
+        size = invoices.count()
+        columns = {
+            'issue_date': np.empty(size, dtype='datetime64[ms]'),
+            'status': np.empty(size, dtype='U16'),
+            # ObjectIds as 12-byte strings so grouping stays vectorised
+            'client': np.empty(size, dtype='S12'),
+            **{field: np.empty(size, dtype=np.int64) for field in self.AMOUNT_FIELDS}
+        }
+        filled = 0
+        for doc in invoices.only(*self.INVOICE_FIELDS).as_pymongo().batch_size(10000):
+            if filled == size:
+                break  # inserted since the count
+            columns['issue_date'][filled] = doc.get('issue_date')
+            columns['status'][filled] = doc.get('status') or ''
+            columns['client'][filled] = doc['client'].binary if doc.get('client') else b''
+            for field in self.AMOUNT_FIELDS:
+                columns[field][filled] = round((doc.get(field) or 0) * 100)
+            filled += 1
+        return {name: column[:filled] for name, column in columns.items()}
+
+    def to_cents(self, values):
+        """Float amounts (as stored) to exact int64 cents"""
+        return np.rint(np.array([value or 0 for value in values], dtype=np.float64) * 100).astype(np.int64)
+
+    def group_sum(self, keys, *weights):
+        """Return (unique keys, counts, sums per weight column) for `keys`"""
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(unique_keys))
+        sums = [
+            np.rint(np.bincount(inverse, weights=weight, minlength=len(unique_keys))).astype(np.int64)
+            for weight in weights
+        ]
+        return unique_keys, counts, sums
+
+    def period_keys(self, dates, period='month'):
+        """Bucket datetime64 values by calendar month or Monday-based week"""
+        if period == 'month':
+            return dates.astype('datetime64[M]')
+        if period == 'week':
+            # Day 0 (1970-01-01) was a Thursday; shift so weeks start on Monday
+            days = dates.astype('datetime64[D]').astype(np.int64)
+            return (((days + 3) // 7) * 7 - 3).astype('datetime64[D]')
+        raise ValueError(f'Invalid period: {period}')
+
+    def format_period(self, key, period='month'):
+        return str(key)[:7] if period == 'month' else str(key)[:10]
+
+    def revenue_by_period(self, columns, period='month'):
+        """Billed, paid (billed amount of paid invoices) and count per period"""
+        paid_totals = np.where(columns['status'] == 'paid', columns['total_amount'], 0)
+        keys, counts, (totals, paid) = self.group_sum(
+            self.period_keys(columns['issue_date'], period), columns['total_amount'], paid_totals
+        )
+        return [
+            {
+                'month' if period == 'month' else 'week': self.format_period(key, period),
+                'total_amount': int(total) / 100,
+                'total_paid': int(paid_amount) / 100,
+                'invoice_count': int(count)
+            }
+            for key, count, total, paid_amount in zip(keys, counts, totals, paid)
+        ]
+
+    def client_totals(self, columns):
+        """Same shape as ReportService.get_client_totals"""
+        keys, counts, (totals, paid) = self.group_sum(
+            columns['client'], columns['total_amount'], columns['paid_amount']
+        )
+        return {
+            # NumPy drops trailing NUL bytes of 'S' values, so pad back to 12
+            ObjectId(bytes(key).ljust(12, b'\0')): {
+                'total_amount': int(total) / 100,
+                'total_paid': int(paid_amount) / 100,
+                'invoice_count': int(count)
+            }
+            for key, count, total, paid_amount in zip(keys, counts, totals, paid)
+            if key
+        }
+
+    def dashboard_summary(self, columns, user_id, start_date, end_date):
+        """Same shape as ReportService.get_dashboard_summary"""
+        statuses, status_counts = np.unique(columns['status'], return_counts=True)
+        pending = np.isin(columns['status'], self.PENDING_STATUSES)
+
+        payments = Payment.objects(
+            user=user_id,
+            status='completed',
+            created_at__gte=start_date,
+            created_at__lte=end_date
+        ).only('amount').as_pymongo()
+        total_paid = self.to_cents([payment.get('amount') for payment in payments]).sum()
+
+        monthly = self.revenue_by_period(columns, 'month')
+        return {
+            'summary': {
+                'total_invoices': int(len(columns['status'])),
+                'total_amount': int(columns['total_amount'].sum()) / 100,
+                'total_paid': int(total_paid) / 100,
+                'total_pending': int(columns['balance_due'][pending].sum()) / 100
+            },
+            'status_counts': {str(status): int(count) for status, count in zip(statuses, status_counts)},
+            'monthly_revenue': [{'month': row['month'], 'amount': row['total_amount']} for row in monthly]
+        }
+
+analytics_service = AnalyticsService()
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+from functools import wraps
+from bson import DBRef
+from flask import request, make_response, Response
+from flask_jwt_extended import get_jwt_identity
+import redis
+
+logger = logging.getLogger(__name__)
+
+class ReportCache:
+    """Redis cache for report responses keyed by (user, endpoint, params).
+
+    Each user has a generation counter that is part of every key; writes
+    bump it, which orphans all of that user's cached reports at once. The
+    TTL is a safety net for writes that bypass the models (raw updates).
+    """
+
+    PREFIX = 'reports'
+
+    def __init__(self):
+        self.redis = None
+        self.ttl = 300
+
+    def init_app(self, app):
+        self.redis = redis.Redis.from_url(app.config['REDIS_URL'])
+        self.ttl = app.config.get('REPORT_CACHE_TTL', self.ttl)
+
+    def _user_key(self, user):
+        if isinstance(user, DBRef):
+            user = user.id
+        elif hasattr(user, 'pk'):
+            user = user.pk
+        return str(user)
+
+    def _generation(self, user_id):
+        return int(self.redis.get(f'{self.PREFIX}:gen:{user_id}') or 0)
+
+    def _key(self, user_id, endpoint, params):
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+        return f'{self.PREFIX}:{user_id}:{self._generation(user_id)}:{endpoint}:{digest}'
+
+    def invalidate(self, user):
+        """Drop every cached report for a user"""
+        if self.redis is None or user is None:
+            return
+        try:
+            self.redis.incr(f'{self.PREFIX}:gen:{self._user_key(user)}')
+        except redis.RedisError as e:
+            logger.error(f"Error invalidating report cache: {str(e)}")
+
+    def stats(self):
+        """Return hit/miss counters since the last reset"""
+        hits, misses = (int(value or 0) for value in self.redis.mget(
+            f'{self.PREFIX}:stats:hits', f'{self.PREFIX}:stats:misses'
+        ))
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else 0.0,
+            'ttl': self.ttl
+        }
+
+    def reset_stats(self):
+        self.redis.delete(f'{self.PREFIX}:stats:hits', f'{self.PREFIX}:stats:misses')
+
+    def cached(self, endpoint):
+        """Cache successful JSON responses of a report view; must run inside
+        `jwt_required` so the user identity is available"""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if self.redis is None:
+                    return fn(*args, **kwargs)
+
+                try:
+                    key = self._key(get_jwt_identity(), endpoint, request.args.to_dict(flat=False))
+                    body = self.redis.get(key)
+                except redis.RedisError as e:
+                    logger.error(f"Error reading report cache: {str(e)}")
+                    return fn(*args, **kwargs)
+
+                if body is not None:
+                    try:
+                        self.redis.incr(f'{self.PREFIX}:stats:hits')
+                    except redis.RedisError as e:
+                        logger.error(f"Error counting report cache hit: {str(e)}")
+                    return Response(body, 200, mimetype='application/json')
+
+                response = make_response(fn(*args, **kwargs))
+                try:
+                    self.redis.incr(f'{self.PREFIX}:stats:misses')
+                    if response.status_code == 200:
+                        self.redis.set(key, response.get_data(), ex=self.ttl)
+                except redis.RedisError as e:
+                    logger.error(f"Error writing report cache: {str(e)}")
+                return response
+            return wrapper
+        return decorator
+
+class CountCache:
+    """Short-lived Redis cache of list totals keyed by (user, collection, filter).
+
+    Like ReportCache, every key carries a per-(user, collection) generation
+    that model writes bump. Bulk deletes across users (notification cleanup)
+    are only picked up when the TTL runs out, so totals are an estimate.
+    """
+
+    PREFIX = 'counts'
+
+    def __init__(self):
+        self.redis = None
+        self.ttl = 60
+
+    def init_app(self, app):
+        self.redis = redis.Redis.from_url(app.config['REDIS_URL'])
+        self.ttl = app.config.get('COUNT_CACHE_TTL', self.ttl)
+
+    def _generation_key(self, user_id, collection):
+        return f'{self.PREFIX}:gen:{user_id}:{collection}'
+
+    def _key(self, user_id, collection, params):
+        generation = int(self.redis.get(self._generation_key(user_id, collection)) or 0)
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        return f'{self.PREFIX}:{user_id}:{collection}:{generation}:{digest}'
+
+    def count(self, queryset, user, collection, params, refresh=False):
+        """Return the cached total for `params`, counting `queryset` on a miss
+        (or always when `refresh` is set) and storing the result"""
+        if self.redis is None:
+            return queryset.count()
+
+        user_id = report_cache._user_key(user)
+        try:
+            key = self._key(user_id, collection, params)
+            cached = None if refresh else self.redis.get(key)
+        except redis.RedisError as e:
+            logger.error(f"Error reading count cache: {str(e)}")
+            return queryset.count()
+
+        if cached is not None:
+            return int(cached)
+
+        total = queryset.count()
+        try:
+            self.redis.set(key, total, ex=self.ttl)
+        except redis.RedisError as e:
+            logger.error(f"Error writing count cache: {str(e)}")
+        return total
+
+    def invalidate(self, user, collection):
+        """Drop every cached total of one collection for a user"""
+        if self.redis is None or user is None:
+            return
+        try:
+            self.redis.incr(self._generation_key(report_cache._user_key(user), collection))
+        except redis.RedisError as e:
+            logger.error(f"Error invalidating count cache: {str(e)}")
+
+report_cache = ReportCache()
+count_cache = CountCache()
@@ -0,0 +1,24 @@
+import hashlib
+import json
+from flask import request, Response
+
+def make_etag(*parts):
+    """Strong ETag over JSON-serializable parts (ObjectIds and datetimes as str)"""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+def row_versions(rows):
+    """Sorted (_id, updated_at) of raw documents for an ETag; models stamp
+    updated_at in save(), so it changes whenever one of them does"""
+    return sorted((row['_id'], row.get('updated_at')) for row in rows)
+
+def not_modified(etag):
+    """304 response if the request's If-None-Match matches `etag`, else None"""
+    if request.if_none_match.contains(etag):
+        return with_etag(Response(status=304), etag)
+    return None
+
+def with_etag(response, etag):
+    """Tag a response; `no-cache` makes browsers revalidate it on every use"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,151 @@
+import hashlib
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from mongoengine import NotUniqueError
+from pymongo.errors import DuplicateKeyError
+from ..models import ExportJob
+from .export_service import ExportService
+from .storage_service import artifact_storage
+
+class ExportJobService:
+    """Creates, runs and expires background export jobs"""
+
+    PROGRESS_EVERY = 5000
+
+    def __init__(self):
+        self.export_service = ExportService()
+
+    def dedupe_key(self, user_id, report_type, format_type, start_date, end_date):
+        parts = [str(user_id), report_type, format_type,
+                 start_date.isoformat() if start_date else '',
+                 end_date.isoformat() if end_date else '']
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def get_or_create_job(self, user_id, report_type, format_type, start_date=None, end_date=None):
+        """Return (job, created). Identical requests share a pending or
+        running job; once it finishes the next request exports afresh, so
+        it sees data changed since."""
+        key = self.dedupe_key(user_id, report_type, format_type, start_date, end_date)
+        token = uuid.uuid4().hex
+
+        try:
+            job = ExportJob.objects(dedupe_key=key).modify(
+                upsert=True,
+                new=True,
+                set_on_insert__user=user_id,
+                set_on_insert__report_type=report_type,
+                set_on_insert__format=format_type,
+                set_on_insert__start_date=start_date,
+                set_on_insert__end_date=end_date,
+                set_on_insert__token=token,
+                set_on_insert__status='pending',
+                set_on_insert__rows_written=0,
+                set_on_insert__created_at=datetime.utcnow()
+            )
+        except (NotUniqueError, DuplicateKeyError):
+            # A concurrent request inserted the same job first
+            job = ExportJob.objects(dedupe_key=key).first()
+            if job is None:
+                # ...and it finished in between
+                return self.get_or_create_job(user_id, report_type, format_type, start_date, end_date)
+
+        return job, job.token == token
+
+    def enqueue(self, job):
+        """Queue the export task; if the broker refuses it, fail the job and
+        release its dedupe key so the request can be retried. Returns whether
+        the task was queued."""
+        from ..tasks import run_export_job
+        try:
+            run_export_job.delay(str(job.id))
+        except Exception as e:
+            ExportJob.objects(id=job.id).update_one(
+                set__status='failed', set__error_message=f'Could not queue export: {str(e)}'[:500],
+                unset__dedupe_key=True
+            )
+            job.reload()
+            return False
+        return True
+
+    def run(self, job_id, task_id=None):
+        """Write the export to a temporary file, reporting progress, then
+        move it into artifact storage"""
+        job = ExportJob.objects(id=job_id, status='pending').modify(
+            new=True, set__status='running', set__started_at=datetime.utcnow(), set__task_id=task_id
+        )
+        if not job:
+            return None
+
+        user_id = job.user.id
+        fd, temp_path = tempfile.mkstemp(suffix=f'.{job.format}')
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                total = self.export_service.count(job.report_type, user_id, job.start_date, job.end_date)
+                ExportJob.objects(id=job.id).update_one(set__total_rows=total)
+
+                written = [0]
+                rows = self._track_progress(job.id, self.export_service.generate(
+                    job.report_type, user_id, job.start_date, job.end_date,
+                    typed=job.format in self.export_service.COLUMNAR_FORMATS
+                ), written)
+                for chunk in self.export_service.encode(rows, job.report_type, job.format):
+                    output.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+
+            size = os.path.getsize(temp_path)
+            location = artifact_storage.store(temp_path, f'exports/{job.filename}')
+            retention = timedelta(hours=current_app.config['EXPORT_RETENTION_HOURS'])
+            now = datetime.utcnow()
+            ExportJob.objects(id=job.id).update_one(
+                set__status='completed',
+                set__rows_written=written[0],
+                set__artifact_location=location,
+                set__artifact_size=size,
+                set__completed_at=now,
+                set__expires_at=now + retention,
+                unset__dedupe_key=True
+            )
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            # Release the dedupe key so the next identical request retries
+            ExportJob.objects(id=job.id).update_one(
+                set__status='failed', set__error_message=str(e)[:500], unset__dedupe_key=True
+            )
+            raise
+
+        return job.reload()
+
+    def _track_progress(self, job_id, rows, written):
+        for row in rows:
+            written[0] += 1
+            if written[0] % self.PROGRESS_EVERY == 0:
+                ExportJob.objects(id=job_id).update_one(set__rows_written=written[0])
+            yield row
+
+    def expire_jobs(self, now=None):
+        """Delete artifacts of expired jobs and give up on jobs that never
+        finished within the retention window; returns how many were expired"""
+        now = now or datetime.utcnow()
+        retention = timedelta(hours=current_app.config['EXPORT_RETENTION_HOURS'])
+
+        ExportJob.objects(status__in=['pending', 'running'], created_at__lte=now - retention).update(
+            set__status='failed', set__error_message='Export did not finish in time', unset__dedupe_key=True
+        )
+
+        expired = 0
+        for job in ExportJob.objects(status='completed', expires_at__lte=now):
+            self.expire_job(job)
+            expired += 1
+        return expired
+
+    def expire_job(self, job):
+        if job.artifact_location:
+            artifact_storage.delete(job.artifact_location)
+        ExportJob.objects(id=job.id).update_one(
+            set__status='expired', unset__dedupe_key=True, unset__artifact_location=True
+        )
+
+export_job_service = ExportJobService()
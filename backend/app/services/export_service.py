@@ -0,0 +1,273 @@
+import csv
+import json
+from decimal import Decimal
+from io import StringIO
+from itertools import islice
+from ..models import Invoice, Client
+from .report_service import ReportService
+
+class ExportService:
+    """Report exports produced row by row from batched, projected cursors"""
+
+    BATCH_SIZE = 1000
+    FLUSH_ROWS = 500
+
+    ROW_GROUP_SIZE = 50000
+
+    REPORT_TYPES = ('revenue', 'clients', 'invoices')
+    FORMATS = ('csv', 'ndjson', 'json', 'parquet', 'arrow')
+    # Binary formats with typed columns: exact decimals and real timestamps
+    COLUMNAR_FORMATS = ('parquet', 'arrow')
+    CONTENT_TYPES = {
+        'csv': 'text/csv',
+        'ndjson': 'application/x-ndjson',
+        'json': 'application/json',
+        'parquet': 'application/vnd.apache.parquet',
+        'arrow': 'application/vnd.apache.arrow.stream'
+    }
+
+    COLUMNS = {
+        'revenue': [
+            'invoice_number', 'issue_date', 'due_date', 'client', 'status',
+            'subtotal', 'tax_total', 'total_amount', 'paid_amount', 'balance_due'
+        ],
+        'clients': [
+            'company_name', 'contact_person', 'email', 'phone', 'billing_address',
+            'billing_city', 'billing_country', 'total_amount', 'total_paid', 'invoice_count'
+        ],
+        'invoices': [
+            'invoice_number', 'issue_date', 'due_date', 'client', 'status', 'currency',
+            'subtotal', 'tax_total', 'discount_total', 'shipping_fee', 'handling_fee',
+            'total_amount', 'paid_amount', 'balance_due', 'notes', 'created_at'
+        ]
+    }
+
+    # Fields of the export rows that come straight from a money DecimalField
+    AMOUNT_FIELDS = {
+        'subtotal', 'tax_total', 'discount_total', 'shipping_fee', 'handling_fee',
+        'total_amount', 'paid_amount', 'balance_due'
+    }
+    DATE_FIELDS = {'issue_date', 'due_date', 'created_at'}
+    CLIENT_AMOUNT_FIELDS = {'total_amount', 'total_paid'}
+    CENT = Decimal('0.01')
+
+    def __init__(self):
+        self.report_service = ReportService()
+
+    def generate(self, report_type, user_id, start_date=None, end_date=None, typed=False):
+        """Return a generator of export rows for `report_type`.
+
+        Rows hold JSON-ready floats and ISO dates, or `Decimal` amounts and
+        `datetime` values when `typed` is set (for columnar formats).
+        """
+        generators = {
+            'revenue': self.generate_revenue_export,
+            'clients': self.generate_clients_export,
+            'invoices': self.generate_invoices_export
+        }
+        if report_type not in generators:
+            raise ValueError(f'Invalid report type: {report_type}')
+        return generators[report_type](user_id, start_date, end_date, typed)
+
+    def generate_revenue_export(self, user_id, start_date, end_date, typed=False):
+        """Yield revenue export rows in issue date order"""
+        invoices = self._invoices(user_id, start_date, end_date).order_by('issue_date')
+        return self._invoice_rows(invoices, self.COLUMNS['revenue'], typed)
+
+    def generate_invoices_export(self, user_id, start_date, end_date, typed=False):
+        """Yield invoice export rows"""
+        invoices = self._invoices(user_id, start_date, end_date)
+        return self._invoice_rows(invoices, self.COLUMNS['invoices'], typed)
+
+    def generate_clients_export(self, user_id, start_date, end_date, typed=False):
+        """Yield one row per active client with its invoice totals"""
+        client_totals = self.report_service.get_client_totals(user_id, start_date, end_date)
+        empty_totals = {'total_amount': 0.0, 'total_paid': 0.0, 'invoice_count': 0}
+        client_fields = self.COLUMNS['clients'][:7]
+
+        clients = Client.objects(user=user_id, is_active=True).only(*client_fields)
+        for client in clients.as_pymongo().batch_size(self.BATCH_SIZE):
+            totals = client_totals.get(client['_id'], empty_totals)
+            row = {field: client.get(field) for field in client_fields}
+            row.update(totals)
+            if typed:
+                for field in self.CLIENT_AMOUNT_FIELDS:
+                    row[field] = self._decimal(row[field])
+            yield row
+
+    def count(self, report_type, user_id, start_date=None, end_date=None):
+        """Number of rows an export will contain"""
+        if report_type == 'clients':
+            return Client.objects(user=user_id, is_active=True).count()
+        return self._invoices(user_id, start_date, end_date).count()
+
+    def stream(self, report_type, format_type, user_id, start_date=None, end_date=None):
+        """Yield the encoded export in chunks of text (or bytes for columnar formats)"""
+        rows = self.generate(report_type, user_id, start_date, end_date,
+                             typed=format_type in self.COLUMNAR_FORMATS)
+        return self.encode(rows, report_type, format_type)
+
+    def encode(self, rows, report_type, format_type):
+        """Encode an iterable of export rows in chunks of text, or of bytes
+        for columnar formats (which expect rows from `generate(typed=True)`)"""
+        if format_type == 'csv':
+            return self._csv_chunks(rows, self.COLUMNS[report_type])
+        if format_type == 'ndjson':
+            return self._ndjson_chunks(rows)
+        if format_type == 'json':
+            return self._json_chunks(rows, report_type)
+        if format_type in self.COLUMNAR_FORMATS:
+            return self._columnar_chunks(rows, report_type, format_type)
+        raise ValueError(f'Invalid export format: {format_type}')
+
+    def _invoices(self, user_id, start_date, end_date):
+        invoices = Invoice.objects(user=user_id)
+        if start_date:
+            invoices = invoices.filter(issue_date__gte=start_date)
+        if end_date:
+            invoices = invoices.filter(issue_date__lte=end_date)
+        return invoices
+
+    def _invoice_rows(self, invoices, columns, typed=False):
+        """Yield rows from a projected raw cursor, resolving client names one
+        `$in` query per batch instead of one dereference per invoice"""
+        fields = [column for column in columns if column != 'client'] + ['client']
+        cursor = iter(invoices.only(*fields).as_pymongo().batch_size(self.BATCH_SIZE))
+        client_names = {}
+
+        while True:
+            batch = list(islice(cursor, self.BATCH_SIZE))
+            if not batch:
+                return
+
+            missing = {raw.get('client') for raw in batch} - set(client_names) - {None}
+            if missing:
+                for client in Client.objects(id__in=list(missing)).only('company_name').as_pymongo():
+                    client_names[client['_id']] = client.get('company_name', '')
+
+            for raw in batch:
+                row = {}
+                for column in columns:
+                    if column == 'client':
+                        row[column] = client_names.get(raw.get('client'), '')
+                    elif column in self.AMOUNT_FIELDS:
+                        row[column] = self._decimal(raw.get(column)) if typed else float(raw.get(column) or 0)
+                    elif column in self.DATE_FIELDS:
+                        row[column] = raw.get(column) if typed or not raw.get(column) else raw[column].isoformat()
+                    else:
+                        row[column] = raw.get(column)
+                yield row
+
+    def _csv_chunks(self, rows, columns):
+        buffer = StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+
+        # Send the header right away so the download starts immediately
+        yield self._drain(buffer)
+        for count, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if count % self.FLUSH_ROWS == 0:
+                yield self._drain(buffer)
+        yield self._drain(buffer)
+
+    def _ndjson_chunks(self, rows):
+        lines = []
+        for row in rows:
+            lines.append(json.dumps(row))
+            if len(lines) == self.FLUSH_ROWS:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+    def _json_chunks(self, rows, report_type):
+        # Same envelope as the original non-streaming JSON export
+        yield json.dumps({'type': report_type, 'format': 'json'})[:-1] + ', "report_data": ['
+        lines = []
+        for count, row in enumerate(rows):
+            lines.append((', ' if count else '') + json.dumps(row))
+            if len(lines) == self.FLUSH_ROWS:
+                yield ''.join(lines)
+                lines = []
+        yield ''.join(lines) + ']}'
+
+    def _drain(self, buffer):
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    def _decimal(self, value):
+        # DecimalFields are stored as floats already rounded to cents, so the
+        # shortest repr converts back to the exact two-place value
+        return Decimal(repr(float(value or 0))).quantize(self.CENT)
+
+    def _arrow_schema(self, report_type):
+        import pyarrow as pa
+
+        fields = []
+        for column in self.COLUMNS[report_type]:
+            if column in self.AMOUNT_FIELDS or column in self.CLIENT_AMOUNT_FIELDS:
+                fields.append(pa.field(column, pa.decimal128(18, 2)))
+            elif column in self.DATE_FIELDS:
+                fields.append(pa.field(column, pa.timestamp('ms')))
+            elif column == 'invoice_count':
+                fields.append(pa.field(column, pa.int64()))
+            else:
+                fields.append(pa.field(column, pa.string()))
+        return pa.schema(fields)
+
+    def _columnar_chunks(self, rows, report_type, format_type):
+        """Write rows as Parquet row groups or Arrow IPC record batches of
+        ROW_GROUP_SIZE rows, yielding the bytes produced by each batch"""
+        import pyarrow as pa
+
+        rows = iter(rows)
+        schema = self._arrow_schema(report_type)
+        sink = _ChunkSink()
+        if format_type == 'parquet':
+            import pyarrow.parquet as pq
+            writer = pq.ParquetWriter(sink, schema, compression='snappy')
+        else:
+            writer = pa.ipc.new_stream(sink, schema)
+
+        try:
+            while True:
+                batch = list(islice(rows, self.ROW_GROUP_SIZE))
+                if not batch:
+                    break
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+class _ChunkSink:
+    """Write-only file object for pyarrow writers that hands out what was
+    written since the last drain, while reporting absolute positions"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from ..models import Invoice, Client, Payment, Notification, RevenueRollup, InvoiceCounter
+
+class IndexAdvisor:
+    """Explains the query shapes the API issues and flags plans that scan a
+    collection, sort in memory or intersect indexes.
+
+    Each shape is the filter and sort a route or report sends to MongoDB
+    (for aggregations, the leading `$match`). Plans do not depend on the
+    values, so shapes are built with placeholder ids and dates.
+    """
+
+    FLAGGED_STAGES = {
+        'COLLSCAN': 'collection scan',
+        'SORT': 'in-memory sort',
+        'AND_SORTED': 'index intersection',
+        'AND_HASH': 'index intersection'
+    }
+    MODELS = (Invoice, Client, Payment, Notification, RevenueRollup, InvoiceCounter)
+
+    def query_shapes(self, user_id=None):
+        """Return [(name, queryset)] for the catalogue of query shapes"""
+        user_id = ObjectId(user_id) if user_id else ObjectId()
+        end = datetime.utcnow()
+        start = end - timedelta(days=365)
+        newest = ('-created_at', '-id')
+
+        return [
+            ('invoices.list', Invoice.objects(user=user_id).order_by(*newest)),
+            ('invoices.list_by_status', Invoice.objects(user=user_id, status='sent').order_by(*newest)),
+            ('invoices.list_by_client', Invoice.objects(user=user_id, client=ObjectId()).order_by(*newest)),
+            ('invoices.by_number', Invoice.objects(user=user_id, invoice_number='INV-0001')),
+            ('reports.invoices_in_range', Invoice.objects(user=user_id, issue_date__gte=start, issue_date__lte=end)),
+            ('reports.aging', Invoice.objects(user=user_id, status__in=['sent', 'overdue'])),
+            ('reports.revenue_rollups', RevenueRollup.objects(user=user_id, day__gte=start, day__lte=end)),
+            ('reports.completed_payments', Payment.objects(
+                user=user_id, status='completed', created_at__gte=start, created_at__lte=end
+            )),
+            ('payments.by_invoice', Payment.objects(invoice=ObjectId()).order_by('-created_at')),
+            ('clients.list', Client.objects(user=user_id, is_active=True).order_by('company_name', 'id')),
+            ('notifications.list', Notification.objects(user=user_id).order_by(*newest)),
+            ('notifications.unread', Notification.objects(user=user_id, is_read=False).order_by(*newest)),
+            ('notifications.unread_count', Notification.objects(user=user_id, is_read=False)),
+            ('notifications.cleanup', Notification.objects(created_at__lt=start))
+        ]
+
+    def plan_stages(self, plan):
+        """Yield every stage name in an explain plan tree (classic or SBE)"""
+        if isinstance(plan, dict):
+            if 'stage' in plan:
+                yield plan['stage']
+            for value in plan.values():
+                yield from self.plan_stages(value)
+        elif isinstance(plan, list):
+            for value in plan:
+                yield from self.plan_stages(value)
+
+    def plan_indexes(self, plan):
+        """Names of the indexes an explain plan tree scans"""
+        if isinstance(plan, dict):
+            if plan.get('indexName'):
+                yield plan['indexName']
+            for value in plan.values():
+                yield from self.plan_indexes(value)
+        elif isinstance(plan, list):
+            for value in plan:
+                yield from self.plan_indexes(value)
+
+    def explain(self, name, queryset):
+        """Return {'name', 'stages', 'indexes', 'problems'} for one shape"""
+        winning_plan = queryset.explain()['queryPlanner']['winningPlan']
+        stages = list(self.plan_stages(winning_plan))
+        return {
+            'name': name,
+            'stages': stages,
+            'indexes': sorted(set(self.plan_indexes(winning_plan))),
+            'problems': sorted({self.FLAGGED_STAGES[stage] for stage in stages if stage in self.FLAGGED_STAGES})
+        }
+
+    def check(self, user_id=None):
+        """Explain every query shape"""
+        return [self.explain(name, queryset) for name, queryset in self.query_shapes(user_id)]
+
+    def index_drift(self):
+        """{collection: {'missing': [...], 'extra': [...]}} between model
+        declarations and the database, for collections that differ"""
+        drift = {}
+        for model in self.MODELS:
+            comparison = model.compare_indexes()
+            if comparison['missing'] or comparison['extra']:
+                drift[model._get_collection_name()] = comparison
+        return drift
+
+    def sync(self):
+        """Create declared indexes and drop undeclared ones; returns the
+        number of indexes dropped"""
+        dropped = 0
+        for model in self.MODELS:
+            model.ensure_indexes()
+            for keys in model.compare_indexes()['extra']:
+                model._get_collection().drop_index(keys)
+                dropped += 1
+        return dropped
+
+index_advisor = IndexAdvisor()
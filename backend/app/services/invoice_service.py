@@ -1,5 +1,6 @@
 import os
 from datetime import datetime
+from decimal import Decimal
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -7,8 +8,21 @@ from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER
 from io import BytesIO
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from bson import ObjectId
+from mongoengine import ValidationError
+from .serializer_service import raw_serializer
 
 class InvoiceService:
+    # Bulk status actions: statuses an invoice may move from, the status it
+    # moves to, the date stamped and the notification queued afterwards
+    STATUS_TRANSITIONS = {
+        'send': {'from': ['draft'], 'to': 'sent', 'date_field': 'sent_date', 'notification': 'sent'},
+        'cancel': {'from': ['draft', 'sent', 'overdue'], 'to': 'cancelled', 'date_field': None, 'notification': None},
+        'mark_paid': {'from': ['sent', 'overdue'], 'to': 'paid', 'date_field': 'paid_date', 'notification': 'paid'}
+    }
+    
     def __init__(self):
         self.styles = getSampleStyleSheet()
         self.setup_custom_styles()
@@ -41,18 +55,313 @@ class InvoiceService:
     
     def generate_invoice_number(self, user):
         """Generate unique invoice number for user"""
+        return self.reserve_invoice_numbers(user, 1)[0]
+    
+    def reserve_invoice_numbers(self, user, count):
+        """Reserve `count` consecutive invoice numbers with one atomic `$inc`
+        on the user's (user, prefix) counter"""
+        from ..models import InvoiceCounter
+        
         prefix = user.invoice_prefix
-        next_number = user.next_invoice_number
+        counters = InvoiceCounter._get_collection()
+        counter = counters.find_one_and_update(
+            {'user': user.pk, 'prefix': prefix},
+            {'$inc': {'value': count}},
+            return_document=ReturnDocument.AFTER
+        )
+        if counter is None:
+            self._seed_invoice_counter(user, prefix)
+            counter = counters.find_one_and_update(
+                {'user': user.pk, 'prefix': prefix},
+                {'$inc': {'value': count}},
+                return_document=ReturnDocument.AFTER
+            )
+        
+        last = counter['value']
+        return [f"{prefix}-{str(number).zfill(4)}" for number in range(last - count + 1, last + 1)]
+    
+    def next_invoice_number(self, user):
+        """The number the user's next invoice will get, without reserving it"""
+        from ..models import InvoiceCounter
         
-        # Check if invoice number already exists
-        while True:
-            invoice_number = f"{prefix}-{next_number}"
-            from ..models import Invoice
-            if not Invoice.objects(invoice_number=invoice_number).first():
-                break
-            next_number = str(int(next_number) + 1).zfill(4)
+        prefix = user.invoice_prefix
+        counter = InvoiceCounter._get_collection().find_one({'user': user.pk, 'prefix': prefix}, {'value': 1})
+        if counter is None:
+            counter = self._seed_invoice_counter(user, prefix)
+        return f"{prefix}-{str(counter['value'] + 1).zfill(4)}"
+    
+    def _seed_invoice_counter(self, user, prefix):
+        """Create the (user, prefix) counter at InvoiceCounter.seed_value,
+        continuing after numbers issued before it existed. Runs once per
+        prefix; a concurrent creator's counter wins and is returned."""
+        from ..models import InvoiceCounter
         
-        return invoice_number
+        counters = InvoiceCounter._get_collection()
+        try:
+            return counters.find_one_and_update(
+                {'user': user.pk, 'prefix': prefix},
+                {'$setOnInsert': {'value': InvoiceCounter.seed_value(user, prefix)}},
+                upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            return counters.find_one({'user': user.pk, 'prefix': prefix})
+    
+    def build_invoice(self, user, client, data, invoice_number):
+        """Unsaved Invoice with items and totals from a create payload"""
+        from ..models import Invoice, InvoiceItem
+        
+        items = []
+        for item_data in data['items']:
+            item = InvoiceItem(
+                description=item_data['description'],
+                quantity=Decimal(str(item_data['quantity'])),
+                unit_price=Decimal(str(item_data['unit_price'])),
+                tax_rate=Decimal(str(item_data.get('tax_rate', 0))),
+                discount_rate=Decimal(str(item_data.get('discount_rate', 0)))
+            )
+            items.append(item)
+        
+        invoice = Invoice(
+            invoice_number=invoice_number,
+            user=user,
+            client=client,
+            due_date=datetime.fromisoformat(data['due_date']),
+            currency=data.get('currency', user.default_currency),
+            items=items,
+            notes=data.get('notes', ''),
+            terms_conditions=data.get('terms_conditions', ''),
+            shipping_fee=Decimal(str(data.get('shipping_fee', 0))),
+            handling_fee=Decimal(str(data.get('handling_fee', 0)))
+        )
+        invoice.calculate_totals()
+        return invoice
+    
+    def create_invoices_bulk(self, user, rows):
+        """Validate and insert many invoice payloads at once.
+        
+        Clients are resolved with one `$in`, numbers come from one counter
+        reservation and valid rows are written with one unordered
+        `insert_many`. Returns one result per row, in payload order.
+        """
+        from ..models import Client, Invoice
+        from .rollup_service import revenue_rollup_service
+        from .cache_service import report_cache, count_cache
+        
+        results = [None] * len(rows)
+        client_ids = set()
+        for index, data in enumerate(rows):
+            if not isinstance(data, dict):
+                results[index] = {'index': index, 'status': 'error', 'error': 'Invoice must be an object'}
+                continue
+            missing = [field for field in ('client_id', 'due_date', 'items') if not data.get(field)]
+            if missing:
+                results[index] = {'index': index, 'status': 'error', 'error': f'Field {missing[0]} is required'}
+            elif not ObjectId.is_valid(data['client_id']):
+                results[index] = {'index': index, 'status': 'error', 'error': 'Client not found'}
+            else:
+                client_ids.add(ObjectId(data['client_id']))
+        
+        owned = {client['_id'] for client in Client.objects(id__in=list(client_ids), user=user.pk).only('id').as_pymongo()}
+        
+        invoices = []
+        for index, data in enumerate(rows):
+            if results[index]:
+                continue
+            client_id = ObjectId(data['client_id'])
+            if client_id not in owned:
+                results[index] = {'index': index, 'status': 'error', 'error': 'Client not found'}
+                continue
+            try:
+                invoice = self.build_invoice(user, client_id, data, invoice_number='pending')
+                invoice.validate()
+            except (KeyError, TypeError, ValueError, ArithmeticError, ValidationError) as e:
+                results[index] = {'index': index, 'status': 'error', 'error': f'Invalid invoice: {str(e)}'}
+                continue
+            invoices.append((index, invoice))
+        
+        if not invoices:
+            return results
+        
+        documents = []
+        for (index, invoice), invoice_number in zip(invoices, self.reserve_invoice_numbers(user, len(invoices))):
+            invoice.invoice_number = invoice_number
+            documents.append(invoice.to_mongo().to_dict())
+        
+        failed = {}
+        try:
+            Invoice._get_collection().insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            failed = {error['index']: error.get('errmsg', 'Write failed') for error in e.details.get('writeErrors', [])}
+        
+        inserted = []
+        for position, ((index, invoice), document) in enumerate(zip(invoices, documents)):
+            if position in failed:
+                results[index] = {'index': index, 'status': 'error', 'error': failed[position]}
+                continue
+            inserted.append(document)
+            results[index] = {
+                'index': index,
+                'status': 'created',
+                'id': str(document['_id']),
+                'invoice_number': document['invoice_number']
+            }
+        
+        # Model save() hooks do not run for insert_many
+        revenue_rollup_service.apply_many(
+            (None, revenue_rollup_service.contribution(document)) for document in inserted
+        )
+        report_cache.invalidate(user)
+        count_cache.invalidate(user, 'invoices')
+        return results
+    
+    def transition_candidates(self, user, action, invoice_ids):
+        """Ids (as strings) of the user's invoices among `invoice_ids` that
+        `action` may move, read with one `$in` query"""
+        from ..models import Invoice
+        
+        transition = self.STATUS_TRANSITIONS[action]
+        ids = [ObjectId(invoice_id) for invoice_id in invoice_ids if ObjectId.is_valid(invoice_id)]
+        query = {'_id': {'$in': ids}, 'user': user.pk, 'status': {'$in': transition['from']}}
+        return [str(raw['_id']) for raw in Invoice._get_collection().find(query, {'_id': 1})]
+    
+    def transition_invoices(self, user, action, invoice_ids):
+        """Apply a guarded status transition to many invoices with one
+        `update_many` filtered on the allowed source statuses.
+        
+        Returns the ids (as strings) that transitioned; invoices that are
+        missing, not the user's or in another status are left untouched.
+        """
+        from ..models import Invoice
+        from .rollup_service import revenue_rollup_service
+        from .cache_service import report_cache, count_cache
+        
+        transition = self.STATUS_TRANSITIONS.get(action)
+        if not transition:
+            raise ValueError(f"action must be one of: {', '.join(self.STATUS_TRANSITIONS)}")
+        
+        ids = [ObjectId(invoice_id) for invoice_id in invoice_ids if ObjectId.is_valid(invoice_id)]
+        query = {'_id': {'$in': ids}, 'user': user.pk, 'status': {'$in': transition['from']}}
+        collection = Invoice._get_collection()
+        
+        # Rollup contributions before the change; also the candidate set
+        fields = {field: 1 for field in revenue_rollup_service.TRACKED_FIELDS}
+        previous = {raw['_id']: raw for raw in collection.find(query, fields)}
+        if not previous:
+            return []
+        
+        now = datetime.utcnow()
+        changes = {'status': transition['to'], 'updated_at': now}
+        if transition['date_field']:
+            changes[transition['date_field']] = now
+        update = [{'$set': changes}]
+        if transition['to'] == 'paid':
+            update.append({'$set': {'paid_amount': '$total_amount', 'balance_due': 0.0}})
+        
+        query['_id'] = {'$in': list(previous)}
+        result = collection.update_many(query, update)
+        if result.modified_count == len(previous):
+            transitioned = list(previous)
+        else:
+            # A concurrent request moved some candidates first; ours carry our timestamp
+            transitioned = [
+                raw['_id'] for raw in collection.find(
+                    {'_id': {'$in': list(previous)}, 'status': transition['to'], 'updated_at': now}, {'_id': 1}
+                )
+            ]
+        
+        current = {
+            raw['_id']: raw for raw in collection.find({'_id': {'$in': transitioned}}, fields)
+        } if transitioned else {}
+        revenue_rollup_service.apply_many(
+            (revenue_rollup_service.contribution(previous[invoice_id]),
+             revenue_rollup_service.contribution(current.get(invoice_id)))
+            for invoice_id in transitioned
+        )
+        report_cache.invalidate(user)
+        count_cache.invalidate(user, 'invoices')
+        return [str(invoice_id) for invoice_id in transitioned]
+    
+    def run_status_side_effects(self, action, user_id, invoice_ids):
+        """Worker side of a bulk transition. For `send`, email each draft and
+        mark sent only the invoices whose email went out, as send_invoice
+        does; failed ones stay drafts. Then notify. Returns the ids notified."""
+        from ..models import Invoice, User
+        from .. import socketio
+        from .notification_service import NotificationService
+        
+        transition = self.STATUS_TRANSITIONS[action]
+        if action == 'send':
+            user = User.objects(id=user_id).first()
+            invoices = Invoice.objects(id__in=invoice_ids, user=user_id, status__in=transition['from']).select_related()
+            delivered = [str(invoice.id) for invoice in invoices if self.send_invoice_email(invoice)]
+            if len(delivered) < len(invoice_ids):
+                print(f"Bulk send: {len(invoice_ids) - len(delivered)} invoices were not emailed and stay drafts")
+            invoice_ids = self.transition_invoices(user, action, delivered) if user and delivered else []
+        
+        if transition['notification'] and invoice_ids:
+            notification_service = NotificationService(socketio)
+            for invoice in Invoice.objects(id__in=invoice_ids, user=user_id).select_related():
+                notification_service.send_invoice_notification(user_id, invoice, transition['notification'])
+        return invoice_ids
+    
+    def list_fields(self, fields=None):
+        """Validate a comma-separated `fields=` value; defaults to Invoice.LIST_FIELDS"""
+        from ..models import Invoice
+        
+        if not fields:
+            return list(Invoice.LIST_FIELDS)
+        allowed = set(raw_serializer.keys('invoice')) | {'client'}
+        selected = [field.strip() for field in fields.split(',') if field.strip() and field.strip() != 'id']
+        unknown = [field for field in selected if field not in allowed]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return selected
+    
+    def list_queryset(self, queryset, fields, sort_field='created_at'):
+        """Project `queryset` to the stored fields behind `fields` (plus the
+        sort key and updated_at for the ETag) and return raw documents
+        instead of Invoice instances"""
+        stored = set(raw_serializer.stored_fields('invoice', fields)) | {sort_field, 'updated_at'}
+        if 'client' in fields:
+            stored.add('client')
+        return queryset.only(*stored).as_pymongo()
+    
+    def load_row_clients(self, rows, fields=None):
+        """Raw clients of raw invoice documents in one `$in` query; empty
+        when `fields` leaves out the client"""
+        from ..models import Client
+        
+        if fields is not None and 'client' not in fields:
+            return {}
+        client_ids = list({row.get('client') for row in rows} - {None})
+        return {
+            client['_id']: client for client in Client.objects(id__in=client_ids).as_pymongo()
+        } if client_ids else {}
+    
+    def serialize_invoice_rows(self, rows, fields=None, clients=None):
+        """Serialize raw invoice documents to the requested to_dict keys
+        (all of them by default), embedding clients from `clients` or
+        `load_row_clients`"""
+        rows = list(rows)
+        invoice_list = raw_serializer.serialize_many('invoice', rows, fields)
+        if fields is None or 'client' in fields:
+            if clients is None:
+                clients = self.load_row_clients(rows, fields)
+            serialized = {client_id: raw_serializer.serialize('client', client) for client_id, client in clients.items()}
+            for row, invoice_data in zip(rows, invoice_list):
+                invoice_data['client'] = serialized.get(row.get('client'))
+        
+        return invoice_list
+    
+    def render_pdf(self, invoice, client, user):
+        """Render a PDF from raw invoice, client and user documents without
+        touching the database"""
+        from ..models import Invoice, Client, User
+        
+        document = Invoice._from_son(invoice)
+        document.client = Client._from_son(client)
+        document.user = User._from_son(user)
+        return self.generate_invoice_pdf(document)
     
     def generate_invoice_pdf(self, invoice):
         """Generate PDF for invoice"""
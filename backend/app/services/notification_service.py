@@ -5,6 +5,7 @@ from typing import Dict, List, Optional, Any
 from flask import current_app, request
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from ..models import User, Notification
+from .cache_service import count_cache
 
 class NotificationService:
     def __init__(self, socketio: SocketIO):
@@ -164,6 +165,7 @@ class NotificationService:
                 is_read=True,
                 read_at=datetime.utcnow()
             )
+            count_cache.invalidate(user_id, 'notifications')
             return True
             
         except Exception as e:
@@ -0,0 +1,87 @@
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from mongoengine.queryset.visitor import Q
+from .cache_service import count_cache
+
+TOTAL_MODES = ('false', 'estimate', 'exact')
+
+def encode_cursor(value, object_id):
+    """Opaque cursor for the position just after (value, object_id)"""
+    if isinstance(value, datetime):
+        payload = {'t': 'dt', 'v': value.isoformat()}
+    else:
+        payload = {'t': 'str', 'v': value}
+    payload['id'] = str(object_id)
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Return (value, ObjectId) from a cursor; raises ValueError if invalid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = datetime.fromisoformat(payload['v']) if payload['t'] == 'dt' else payload['v']
+        return value, ObjectId(payload['id'])
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def keyset_page(queryset, sort_field, per_page, cursor=None, descending=False):
+    """Return (documents, next_cursor) for the page after `cursor`.
+
+    Pages are ordered by (sort_field, _id), so the query needs a compound
+    index ending in those two fields to seek straight to the position.
+    """
+    direction = '-' if descending else '+'
+    queryset = queryset.order_by(f'{direction}{sort_field}', f'{direction}id')
+
+    if cursor:
+        value, object_id = decode_cursor(cursor)
+        op = 'lt' if descending else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{sort_field}__{op}': value}) |
+            (Q(**{sort_field: value}) & Q(**{f'id__{op}': object_id}))
+        )
+
+    documents = list(queryset.limit(per_page + 1))
+    next_cursor = None
+    if len(documents) > per_page:
+        documents = documents[:per_page]
+        next_cursor = cursor_after(documents[-1], sort_field)
+    return documents, next_cursor
+
+def paginate(queryset, sort_field, per_page, page=1, cursor=None, descending=False):
+    """Return (documents, next_cursor) using the cursor when one is given
+    (an empty cursor means the first page) and skip-based `page` otherwise"""
+    if cursor is not None:
+        return keyset_page(queryset, sort_field, per_page, cursor, descending)
+
+    direction = '-' if descending else '+'
+    # One extra row tells whether another page follows
+    documents = list(
+        queryset.order_by(f'{direction}{sort_field}', f'{direction}id').skip((page - 1) * per_page).limit(per_page + 1)
+    )
+    next_cursor = None
+    if len(documents) > per_page:
+        documents = documents[:per_page]
+        next_cursor = cursor_after(documents[-1], sort_field)
+    return documents, next_cursor
+
+def cursor_after(document, sort_field):
+    """Cursor for the page that follows `document` (a Document or, from
+    `as_pymongo()`, a raw dict)"""
+    if isinstance(document, dict):
+        return encode_cursor(document[sort_field], document['_id'])
+    return encode_cursor(getattr(document, sort_field), document.pk)
+
+def list_total(queryset, include_total, user, collection, params):
+    """Total for a list response: None for 'false', a cached count for
+    'estimate' and a fresh count (which refreshes the cache) for 'exact'"""
+    if include_total not in TOTAL_MODES:
+        raise ValueError(f"include_total must be one of: {', '.join(TOTAL_MODES)}")
+    if include_total == 'false':
+        return None
+    return count_cache.count(queryset, user, collection, params, refresh=include_total == 'exact')
+
+def page_count(total, per_page):
+    return (total + per_page - 1) // per_page if total is not None else None
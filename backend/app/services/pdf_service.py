@@ -0,0 +1,485 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+import logging
+import unicodedata
+import multiprocessing
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import quote
+import redis
+from flask import send_file, Response
+from pymongo import UpdateOne
+from ..models import Invoice, Client, User
+from .etags import not_modified, with_etag
+
+logger = logging.getLogger(__name__)
+
+_renderer = None
+
+def _render_job(job):
+    """Process pool worker: render one invoice from prefetched documents"""
+    global _renderer
+    if _renderer is None:
+        from .invoice_service import InvoiceService
+        _renderer = InvoiceService()
+    key, sources = job
+    try:
+        return key, _renderer.render_pdf(*sources)
+    except Exception as e:
+        logger.error(f"Error rendering PDF {key}: {str(e)}")
+        return key, None
+
+def _disposition_names(filename):
+    """Content-Disposition parameters as `send_file` builds them: the name
+    as is if it is ASCII, else an ASCII fallback plus RFC 5987 `filename*`"""
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': f"UTF-8''{quote(filename, safe='!#$&+-.^_`|~')}"}
+    return {'filename': filename}
+
+def _pool_context():
+    """Start render workers from a fresh server process instead of forking
+    the caller, whose Mongo and Redis clients hold threads and locks"""
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+class _ZipStream:
+    """Write-only sink for ZipFile that hands back what was written since
+    the last drain; not seekable, so ZipFile writes data descriptors"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+class PdfService:
+    """Content-addressed on-disk cache of rendered invoice PDFs.
+
+    A PDF is stored under the SHA-256 of everything the layout reads (the
+    invoice, its client and the issuing company, see RENDER_FIELDS) plus
+    TEMPLATE_VERSION, so any change to that state or to the template gives
+    a new file and stale files are simply never read again. Hits bump the
+    file's mtime and `evict` deletes the least recently used files once the
+    cache grows past PDF_CACHE_MAX_BYTES.
+
+    Renders are claimed per key in Redis, so a key is rendered by at most one
+    request or worker at a time; others wait for the file to appear.
+    """
+
+    # Bump whenever the layout in InvoiceService.generate_invoice_pdf changes
+    TEMPLATE_VERSION = 1
+
+    RENDER_FIELDS = {
+        'invoice': (
+            'invoice_number', 'issue_date', 'due_date', 'currency', 'items', 'subtotal', 'tax_total',
+            'discount_total', 'shipping_fee', 'handling_fee', 'total_amount', 'paid_amount', 'balance_due',
+            'notes', 'terms_conditions'
+        ),
+        'client': (
+            'company_name', 'contact_person', 'billing_address', 'billing_city', 'billing_state',
+            'billing_zip_code', 'billing_country'
+        ),
+        'user': ('company_name', 'company_address', 'company_phone', 'company_website')
+    }
+    EVICT_INTERVAL = 60  # seconds between size checks triggered by renders
+    LOW_WATERMARK = 0.9  # evict down to this fraction of the cap
+    RENDER_TIMEOUT = 120  # seconds before an abandoned render claim expires
+    POLL_INTERVAL = 0.1
+    BATCH_CHUNK = 1000  # invoices prefetched per round of a batch render
+    ARCHIVE_CHUNK = 50  # smaller rounds so archive downloads start quickly
+    READ_SIZE = 64 * 1024
+
+    def __init__(self):
+        self.root = None
+        self.max_bytes = 1024 ** 3
+        self._last_evict = 0.0
+        self.redis = None
+        self.render_wait = 5
+        self.archive_workers = 2
+        self.delivery = 'send_file'
+        self.accel_prefix = '/_pdf-cache/'
+
+    def init_app(self, app):
+        self.root = app.config['PDF_CACHE_DIR']
+        self.max_bytes = app.config.get('PDF_CACHE_MAX_BYTES', self.max_bytes)
+        self.render_wait = app.config.get('PDF_RENDER_WAIT', self.render_wait)
+        self.archive_workers = app.config.get('PDF_ARCHIVE_WORKERS', self.archive_workers)
+        self.delivery = app.config.get('PDF_DELIVERY', self.delivery)
+        self.accel_prefix = app.config.get('PDF_ACCEL_PREFIX', self.accel_prefix)
+        self.redis = redis.Redis.from_url(app.config['REDIS_URL'])
+        os.makedirs(self.root, exist_ok=True)
+
+    def load_sources(self, invoice_ids, user_id=None):
+        """Return {invoice_id: (invoice, client, user)} raw documents holding
+        the render fields, with one query per collection"""
+        invoices = Invoice.objects(id__in=list(invoice_ids))
+        if user_id:
+            invoices = invoices.filter(user=user_id)
+        invoices = list(invoices.only('client', 'user', 'pdf_path', *self.RENDER_FIELDS['invoice']).as_pymongo())
+
+        client_ids = list({invoice.get('client') for invoice in invoices} - {None})
+        user_ids = list({invoice.get('user') for invoice in invoices} - {None})
+        clients = {
+            client['_id']: client
+            for client in Client.objects(id__in=client_ids).only(*self.RENDER_FIELDS['client']).as_pymongo()
+        } if client_ids else {}
+        users = {
+            user['_id']: user
+            for user in User.objects(id__in=user_ids).only(*self.RENDER_FIELDS['user']).as_pymongo()
+        } if user_ids else {}
+
+        return {
+            invoice['_id']: (invoice, clients.get(invoice.get('client'), {}), users.get(invoice.get('user'), {}))
+            for invoice in invoices
+        }
+
+    def render_key(self, sources):
+        """SHA-256 over the template version and the render fields"""
+        state = [self.TEMPLATE_VERSION] + [
+            {field: document.get(field) for field in self.RENDER_FIELDS[name]}
+            for name, document in zip(('invoice', 'client', 'user'), sources)
+        ]
+        return hashlib.sha256(json.dumps(state, sort_keys=True, default=str).encode()).hexdigest()
+
+    def cache_path(self, key):
+        return os.path.join(self.root, key[:2], f'{key}.pdf')
+
+    def filename(self, sources):
+        return f"invoice_{sources[0].get('invoice_number')}.pdf"
+
+    def lookup(self, key):
+        """Path of a cached PDF (marking it recently used), or None"""
+        path = self.cache_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def store(self, key, pdf_data):
+        """Write a rendered PDF atomically and return its path"""
+        path = self.cache_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique per writer: threads of one process may store the same key
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(pdf_data)
+            # mkstemp creates 0600; nginx reads the cache under x-accel
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        if time.monotonic() - self._last_evict > self.EVICT_INTERVAL:
+            self.evict()
+        return path
+
+    def _claim_key(self, key):
+        return f'pdfs:rendering:{key}'
+
+    def claim(self, key):
+        """Take the render claim on a key; without Redis every caller renders"""
+        if self.redis is None:
+            return True
+        try:
+            return bool(self.redis.set(self._claim_key(key), os.getpid(), nx=True, ex=self.RENDER_TIMEOUT))
+        except redis.RedisError as e:
+            logger.error(f"Error claiming PDF render: {str(e)}")
+            return True
+
+    def release(self, key):
+        if self.redis is None:
+            return
+        try:
+            self.redis.delete(self._claim_key(key))
+        except redis.RedisError as e:
+            logger.error(f"Error releasing PDF render: {str(e)}")
+
+    def rendering(self, key):
+        """Whether a render of the key is in flight"""
+        if self.redis is None:
+            return False
+        try:
+            return bool(self.redis.exists(self._claim_key(key)))
+        except redis.RedisError as e:
+            logger.error(f"Error checking PDF render: {str(e)}")
+            return False
+
+    def wait_for(self, key, timeout):
+        """Wait up to `timeout` seconds for an in-flight render of the key;
+        returns its path, or None if it is still rendering or was abandoned"""
+        deadline = time.monotonic() + timeout
+        while self.rendering(key):
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.POLL_INTERVAL)
+            path = self.lookup(key)
+            if path:
+                return path
+        return self.lookup(key)
+
+    def _render(self, key, sources):
+        from .invoice_service import InvoiceService
+
+        pdf_data = InvoiceService().render_pdf(*sources)
+        return self.store(key, pdf_data) if pdf_data else None
+
+    def _link(self, sources, path):
+        if sources[0].get('pdf_path') != path:
+            Invoice.objects(id=sources[0]['_id']).update_one(set__pdf_path=path)
+
+    def get_or_render(self, invoice_id, user_id=None, wait=None):
+        """Return (path, filename) of the invoice's PDF, rendering it on a
+        cache miss. Path is None while another render of the same content is
+        still in flight after `wait` seconds (PDF_RENDER_WAIT by default).
+        Returns None if the invoice does not exist or fails to render."""
+        sources = next(iter(self.load_sources([invoice_id], user_id).values()), None)
+        if not sources:
+            return None
+
+        key = self.render_key(sources)
+        path = self.lookup(key) or self.wait_for(key, self.render_wait if wait is None else wait)
+        if path is None:
+            if not self.claim(key):
+                return None, self.filename(sources)
+            try:
+                path = self._render(key, sources)
+            finally:
+                self.release(key)
+            if path is None:
+                return None
+
+        self._link(sources, path)
+        return path, self.filename(sources)
+
+    def response(self, path, filename):
+        """Response serving a cached PDF without reading it into Python.
+
+        The file name is the render key, so it doubles as a strong ETag.
+        `send_file` streams through wsgi.file_wrapper (sendfile under
+        gunicorn) and answers Range and conditional requests; with
+        PDF_DELIVERY=x-accel the body is left to nginx through an
+        X-Accel-Redirect under PDF_ACCEL_PREFIX, which also serves ranges.
+        """
+        etag = os.path.splitext(os.path.basename(path))[0]
+        if self.delivery != 'x-accel':
+            return with_etag(send_file(
+                path, mimetype='application/pdf', as_attachment=True, download_name=filename, etag=etag
+            ), etag)
+
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        response = Response(mimetype='application/pdf')
+        response.headers.set('Content-Disposition', 'attachment', **_disposition_names(filename))
+        response.headers['X-Accel-Redirect'] = self.accel_prefix + os.path.relpath(path, self.root).replace(os.sep, '/')
+        return with_etag(response, etag)
+
+    def prerender(self, invoice_id):
+        """Queue a background render of the invoice's current state unless it
+        is already cached or rendering; returns whether a task was queued"""
+        from ..tasks import render_invoice_pdf
+
+        sources = next(iter(self.load_sources([invoice_id]).values()), None)
+        if not sources:
+            return False
+
+        key = self.render_key(sources)
+        if self.lookup(key) or not self.claim(key):
+            return False
+        try:
+            render_invoice_pdf.delay(str(invoice_id), key)
+        except Exception as e:
+            self.release(key)
+            logger.error(f"Error queueing PDF render: {str(e)}")
+            return False
+        return True
+
+    def render_claimed(self, invoice_id, key):
+        """Worker side of `prerender`: render the invoice if it still hashes
+        to the claimed key, then release the claim"""
+        try:
+            sources = next(iter(self.load_sources([invoice_id]).values()), None)
+            # A later edit queued its own render for the new key
+            if not sources or self.render_key(sources) != key:
+                return None
+            path = self.lookup(key) or self._render(key, sources)
+            if path:
+                self._link(sources, path)
+            return path
+        finally:
+            self.release(key)
+
+    def worker_count(self):
+        """CPUs this process may run on (honours container CPU affinity)"""
+        try:
+            return len(os.sched_getaffinity(0))
+        except AttributeError:
+            return os.cpu_count() or 1
+
+    def batch_ids(self, user_id=None, issued_from=None, issued_to=None, status=None, client_id=None):
+        """Ids of the invoices a batch render or archive covers"""
+        invoices = Invoice.objects
+        if user_id:
+            invoices = invoices.filter(user=user_id)
+        if issued_from:
+            invoices = invoices.filter(issue_date__gte=issued_from)
+        if issued_to:
+            invoices = invoices.filter(issue_date__lt=issued_to)
+        if status:
+            invoices = invoices.filter(status=status)
+        if client_id:
+            invoices = invoices.filter(client=client_id)
+        return [invoice['_id'] for invoice in invoices.only('id').as_pymongo()]
+
+    def iter_rendered(self, invoice_ids, user_id=None, workers=None, chunk_size=None):
+        """Yield (sources, path, rendered) for each invoice, rendering cache
+        misses on a process pool and storing them; path is None if the
+        render failed.
+
+        Documents are prefetched `chunk_size` invoices at a time with
+        `load_sources`, so workers only run ReportLab and never query Mongo.
+        Within a chunk cache hits are yielded first, then renders in order.
+        If the pool fails (a worker dies), the chunk's unfinished renders
+        count as failed and later chunks go to a new pool.
+        """
+        workers = workers or self.worker_count()
+        chunk_size = chunk_size or self.BATCH_CHUNK
+        invoice_ids = list(invoice_ids)
+        pool = self._pool(workers)
+        try:
+            for start in range(0, len(invoice_ids), chunk_size):
+                pending = {}
+                for sources in self.load_sources(invoice_ids[start:start + chunk_size], user_id).values():
+                    key = self.render_key(sources)
+                    path = self.lookup(key)
+                    if path:
+                        yield sources, path, False
+                    else:
+                        pending[key] = sources
+
+                chunksize = max(1, len(pending) // (workers * 4))
+                results, failed = None, False
+                for key, sources in pending.items():
+                    pdf_data = None
+                    if not failed:
+                        try:
+                            if results is None:
+                                results = pool.map(_render_job, pending.items(), chunksize=chunksize)
+                            pdf_data = next(results)[1]
+                        except Exception as e:
+                            logger.error(f"PDF render pool failed: {str(e)}")
+                            failed = True
+                            if isinstance(e, BrokenProcessPool):
+                                pool.shutdown(wait=False, cancel_futures=True)
+                                pool = self._pool(workers)
+                    yield sources, self.store(key, pdf_data) if pdf_data else None, True
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    def _pool(self, workers):
+        return ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context())
+
+    def render_batch(self, invoice_ids, workers=None):
+        """Render many invoices into the cache on a process pool and link
+        `pdf_path` with one bulk write per BATCH_CHUNK invoices. Returns
+        counters of rendered, cached and failed invoices."""
+        stats = {'rendered': 0, 'cached': 0, 'failed': 0}
+        links = []
+        for sources, path, rendered in self.iter_rendered(invoice_ids, workers=workers):
+            if path is None:
+                stats['failed'] += 1
+                continue
+            stats['rendered' if rendered else 'cached'] += 1
+            if sources[0].get('pdf_path') != path:
+                links.append(UpdateOne({'_id': sources[0]['_id']}, {'$set': {'pdf_path': path}}))
+            if len(links) >= self.BATCH_CHUNK:
+                Invoice._get_collection().bulk_write(links, ordered=False)
+                links = []
+        if links:
+            Invoice._get_collection().bulk_write(links, ordered=False)
+        self.evict()
+        return stats
+
+    def iter_archive(self, invoice_ids, user_id=None, workers=None):
+        """Yield a ZIP of the invoices' PDFs as it is built. PDFs are copied
+        from the cache in READ_SIZE blocks and at most ARCHIVE_CHUNK renders
+        are in flight, so memory stays flat whatever the archive size."""
+        stream = _ZipStream()
+        failed = []
+        with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            renders = self.iter_rendered(invoice_ids, user_id, workers or self.archive_workers, self.ARCHIVE_CHUNK)
+            for sources, path, _ in renders:
+                filename = self.filename(sources)
+                try:
+                    if path is None:
+                        raise FileNotFoundError(filename)
+                    with open(path, 'rb') as source, archive.open(filename, 'w') as entry:
+                        for block in iter(lambda: source.read(self.READ_SIZE), b''):
+                            entry.write(block)
+                            if stream.chunks:
+                                yield stream.drain()
+                except FileNotFoundError:
+                    failed.append(filename)
+                if stream.chunks:
+                    yield stream.drain()
+            if failed:
+                logger.error(f"PDF archive is missing {len(failed)} invoices")
+                archive.writestr('MISSING.txt', 'Could not render:\n' + '\n'.join(failed) + '\n')
+        yield stream.drain()
+
+    def evict(self):
+        """Delete least recently used PDFs until the cache is under the low
+        watermark; returns (files removed, bytes freed)"""
+        self._last_evict = time.monotonic()
+        entries = []
+        total = 0
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if not name.endswith('.pdf'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return 0, 0
+
+        removed, freed = 0, 0
+        target = self.max_bytes * self.LOW_WATERMARK
+        for _, size, path in sorted(entries):
+            if total - freed <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+            freed += size
+        logger.info(f"Evicted {removed} cached PDFs ({freed} bytes)")
+        return removed, freed
+
+pdf_service = PdfService()
@@ -0,0 +1,291 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from flask import current_app, has_app_context
+from ..models import Invoice, Payment, Client, RevenueRollup
+
+class ReportService:
+    """Report computations. With the default `aggregation` engine the
+    dashboard and client totals run server-side as MongoDB aggregations;
+    with `numpy` (opt-in) they are computed in-process by the NumPy
+    analytics engine. The engine is the one passed in, else REPORT_ENGINE
+    from the current app, else `aggregation`. Revenue by month always reads
+    the pre-aggregated daily rollups."""
+
+    DEFAULT_ENGINE = 'aggregation'
+
+    PENDING_STATUSES = ['sent', 'draft']
+    TOP_CLIENT_SORTS = ('total_amount', 'total_paid')
+
+    # Issued invoices that can still be owed money
+    RECEIVABLE_STATUSES = ['sent', 'overdue']
+    AGING_BUCKETS = ['current', '1_30', '31_60', '61_90', '90_plus']
+
+    # Per-client billed/paid totals. Only indexed fields are read, so the
+    # (user, issue_date, client, total_amount, paid_amount) index covers the scan
+    CLIENT_TOTALS_STAGES = [
+        {'$project': {'_id': 0, 'client': 1, 'total_amount': 1, 'paid_amount': 1}},
+        {'$group': {
+            '_id': '$client',
+            'total_amount': {'$sum': '$total_amount'},
+            'total_paid': {'$sum': '$paid_amount'},
+            'invoice_count': {'$sum': 1}
+        }}
+    ]
+
+    def __init__(self, engine=None):
+        self.engine = engine
+
+    def _analytics(self):
+        """The NumPy analytics engine if `numpy` is selected, else None"""
+        engine = self.engine
+        if engine is None:
+            engine = current_app.config.get('REPORT_ENGINE', self.DEFAULT_ENGINE) if has_app_context() else self.DEFAULT_ENGINE
+        if engine == 'numpy':
+            from .analytics_service import analytics_service
+            return analytics_service
+        return None
+
+    def get_dashboard_summary(self, user_id, start_date, end_date):
+        """Compute dashboard totals, status histogram, monthly buckets and
+        completed payments in a single aggregation round trip"""
+        analytics = self._analytics()
+        if analytics:
+            columns = analytics.load_invoice_columns(user_id, start_date, end_date)
+            return analytics.dashboard_summary(columns, user_id, start_date, end_date)
+
+        pipeline = [
+            {'$project': {
+                '_id': 0,
+                'kind': {'$literal': 'invoice'},
+                'status': 1,
+                'total_amount': 1,
+                'balance_due': 1,
+                'month': {'$dateToString': {'format': '%Y-%m', 'date': '$issue_date'}}
+            }},
+            {'$unionWith': {
+                'coll': Payment._get_collection_name(),
+                'pipeline': [
+                    {'$match': {
+                        'user': ObjectId(str(user_id)),
+                        'status': 'completed',
+                        'created_at': {'$gte': start_date, '$lte': end_date}
+                    }},
+                    {'$project': {'_id': 0, 'kind': {'$literal': 'payment'}, 'amount': 1}}
+                ]
+            }},
+            {'$facet': {
+                'summary': [
+                    {'$match': {'kind': 'invoice'}},
+                    {'$group': {
+                        '_id': None,
+                        'total_invoices': {'$sum': 1},
+                        'total_amount': {'$sum': '$total_amount'},
+                        'total_pending': {'$sum': {'$cond': [
+                            {'$in': ['$status', self.PENDING_STATUSES]}, '$balance_due', 0
+                        ]}}
+                    }}
+                ],
+                'status_counts': [
+                    {'$match': {'kind': 'invoice'}},
+                    {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+                ],
+                'monthly_revenue': [
+                    {'$match': {'kind': 'invoice'}},
+                    {'$group': {'_id': '$month', 'amount': {'$sum': '$total_amount'}}},
+                    {'$sort': {'_id': 1}}
+                ],
+                'payments': [
+                    {'$match': {'kind': 'payment'}},
+                    {'$group': {'_id': None, 'total_paid': {'$sum': '$amount'}}}
+                ]
+            }}
+        ]
+
+        invoices = Invoice.objects(
+            user=user_id,
+            issue_date__gte=start_date,
+            issue_date__lte=end_date
+        )
+        result = next(invoices.aggregate(pipeline), {})
+
+        summary = (result.get('summary') or [{}])[0]
+        payments = (result.get('payments') or [{}])[0]
+
+        return {
+            'summary': {
+                'total_invoices': summary.get('total_invoices', 0),
+                'total_amount': float(summary.get('total_amount', 0)),
+                'total_paid': float(payments.get('total_paid', 0)),
+                'total_pending': float(summary.get('total_pending', 0))
+            },
+            'status_counts': {row['_id']: row['count'] for row in result.get('status_counts', [])},
+            'monthly_revenue': [
+                {'month': row['_id'], 'amount': float(row['amount'])}
+                for row in result.get('monthly_revenue', [])
+            ]
+        }
+
+    def get_top_clients(self, user_id, start_date, end_date, limit=5, sort_by='total_amount'):
+        """Return the top `limit` clients ranked by billed (`total_amount`)
+        or paid (`total_paid`) amount, with client names joined in"""
+        if sort_by not in self.TOP_CLIENT_SORTS:
+            raise ValueError(f'Cannot rank clients by {sort_by}')
+
+        pipeline = self.CLIENT_TOTALS_STAGES + [
+            {'$sort': {sort_by: -1, '_id': 1}},
+            {'$limit': limit},
+            {'$lookup': {
+                'from': Client._get_collection_name(),
+                'localField': '_id',
+                'foreignField': '_id',
+                'pipeline': [{'$project': {'company_name': 1, 'contact_person': 1, 'email': 1}}],
+                'as': 'client'
+            }},
+            {'$unwind': {'path': '$client', 'preserveNullAndEmptyArrays': True}}
+        ]
+
+        invoices = Invoice.objects(
+            user=user_id,
+            issue_date__gte=start_date,
+            issue_date__lte=end_date
+        )
+
+        top_clients = []
+        for row in invoices.aggregate(pipeline):
+            client = row.get('client') or {}
+            top_clients.append({
+                'client_id': str(row['_id']),
+                'company_name': client.get('company_name'),
+                'contact_person': client.get('contact_person'),
+                'email': client.get('email'),
+                'total_amount': float(row['total_amount']),
+                'total_paid': float(row['total_paid']),
+                'invoice_count': row['invoice_count']
+            })
+        return top_clients
+
+    def get_client_totals(self, user_id, start_date=None, end_date=None):
+        """Return {client_id: {'total_amount', 'total_paid', 'invoice_count'}}
+        for every client with invoices in the range, from one `$group`"""
+        analytics = self._analytics()
+        if analytics:
+            return analytics.client_totals(analytics.load_invoice_columns(user_id, start_date, end_date))
+
+        invoices = Invoice.objects(user=user_id)
+        if start_date:
+            invoices = invoices.filter(issue_date__gte=start_date)
+        if end_date:
+            invoices = invoices.filter(issue_date__lte=end_date)
+
+        return {
+            row['_id']: {
+                'total_amount': float(row['total_amount']),
+                'total_paid': float(row['total_paid']),
+                'invoice_count': row['invoice_count']
+            }
+            for row in invoices.aggregate(self.CLIENT_TOTALS_STAGES)
+        }
+
+    def get_revenue_by_month(self, user_id, start_date, end_date):
+        """Monthly billed/paid totals read from the daily revenue rollups.
+
+        Rollups have day granularity, so the range is widened to whole days.
+        They hold at most one document per day and status, so this path is
+        used whatever the engine.
+        """
+        start_day = datetime(start_date.year, start_date.month, start_date.day)
+        rollups = RevenueRollup.objects(user=user_id, day__gte=start_day, day__lte=end_date)
+
+        pipeline = [
+            {'$group': {
+                '_id': {'$dateToString': {'format': '%Y-%m', 'date': '$day'}},
+                'total_amount': {'$sum': '$total_amount'},
+                'total_paid': {'$sum': {'$cond': [{'$eq': ['$status', 'paid']}, '$total_amount', 0]}},
+                'invoice_count': {'$sum': '$invoice_count'}
+            }},
+            {'$match': {'invoice_count': {'$gt': 0}}},
+            {'$sort': {'_id': 1}}
+        ]
+
+        return [
+            {
+                'month': row['_id'],
+                'total_amount': round(float(row['total_amount']), 2),
+                'total_paid': round(float(row['total_paid']), 2),
+                'invoice_count': row['invoice_count']
+            }
+            for row in rollups.aggregate(pipeline)
+        ]
+
+    def get_aging_report(self, user_id, as_of=None):
+        """Accounts-receivable aging: open balances per client and currency
+        in current, 1-30, 31-60, 61-90 and 90+ days past due buckets.
+
+        Served by the (user, status, due_date) index in one aggregation.
+        """
+        as_of = as_of or datetime.utcnow()
+        as_of = datetime(as_of.year, as_of.month, as_of.day)
+
+        bucket = {'$switch': {
+            'branches': [
+                {'case': {'$gte': ['$due_date', as_of]}, 'then': 'current'},
+                {'case': {'$gte': ['$due_date', as_of - timedelta(days=30)]}, 'then': '1_30'},
+                {'case': {'$gte': ['$due_date', as_of - timedelta(days=60)]}, 'then': '31_60'},
+                {'case': {'$gte': ['$due_date', as_of - timedelta(days=90)]}, 'then': '61_90'}
+            ],
+            'default': '90_plus'
+        }}
+
+        pipeline = [
+            {'$match': {'balance_due': {'$gt': 0}}},
+            {'$group': {
+                '_id': {'client': '$client', 'currency': '$currency', 'bucket': bucket},
+                'amount': {'$sum': '$balance_due'},
+                'invoice_count': {'$sum': 1}
+            }},
+            {'$group': {
+                '_id': {'client': '$_id.client', 'currency': '$_id.currency'},
+                'buckets': {'$push': {'k': '$_id.bucket', 'v': '$amount'}},
+                'total': {'$sum': '$amount'},
+                'invoice_count': {'$sum': '$invoice_count'}
+            }},
+            {'$sort': {'total': -1}},
+            {'$lookup': {
+                'from': Client._get_collection_name(),
+                'localField': '_id.client',
+                'foreignField': '_id',
+                'pipeline': [{'$project': {'company_name': 1}}],
+                'as': 'client'
+            }}
+        ]
+
+        invoices = Invoice.objects(user=user_id, status__in=self.RECEIVABLE_STATUSES)
+
+        clients = []
+        totals = {}
+        for row in invoices.aggregate(pipeline):
+            currency = row['_id']['currency']
+            amounts = {name: 0.0 for name in self.AGING_BUCKETS}
+            for entry in row['buckets']:
+                amounts[entry['k']] = round(float(entry['v']), 2)
+
+            currency_totals = totals.setdefault(currency, {name: 0.0 for name in self.AGING_BUCKETS + ['total']})
+            for name, amount in amounts.items():
+                currency_totals[name] = round(currency_totals[name] + amount, 2)
+            currency_totals['total'] = round(currency_totals['total'] + float(row['total']), 2)
+
+            clients.append({
+                'client_id': str(row['_id']['client']),
+                'company_name': row['client'][0].get('company_name') if row['client'] else None,
+                'currency': currency,
+                'buckets': amounts,
+                'total': round(float(row['total']), 2),
+                'invoice_count': row['invoice_count']
+            })
+
+        return {
+            'as_of': as_of.date().isoformat(),
+            'buckets': self.AGING_BUCKETS,
+            'clients': clients,
+            'totals': totals
+        }
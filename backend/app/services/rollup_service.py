@@ -0,0 +1,214 @@
+from datetime import datetime
+from uuid import uuid4
+from pymongo import UpdateOne, ReturnDocument
+from ..models import Invoice, RevenueRollup
+
+class RevenueRollupService:
+    """Keeps the `revenue_rollups` collection in step with raw invoices"""
+
+    # Invoice fields that feed a rollup bucket or its totals
+    TRACKED_FIELDS = {'user', 'issue_date', 'currency', 'status', 'total_amount', 'paid_amount', 'balance_due'}
+    AMOUNT_FIELDS = ('total_amount', 'paid_amount', 'balance_due')
+    TOLERANCE = 0.005
+
+    def needs_update(self, invoice):
+        """Whether saving `invoice` can change its rollup contribution"""
+        return invoice._created or bool(self.TRACKED_FIELDS & set(invoice._get_changed_fields()))
+
+    def swap(self, invoice):
+        """Write the tracked fields of an existing invoice and return its
+        contribution from just before the write, in one atomic
+        `find_one_and_update`, so concurrent saves chain their deltas"""
+        son = invoice.to_mongo()
+        before = Invoice._get_collection().find_one_and_update(
+            {'_id': invoice.pk},
+            {'$set': {field: son[field] for field in self.TRACKED_FIELDS if field in son}},
+            projection=list(self.TRACKED_FIELDS),
+            return_document=ReturnDocument.BEFORE
+        )
+        return self.contribution(before)
+
+    def take(self, invoice_id):
+        """Delete an invoice and return its contribution, atomically; None
+        if another delete got there first"""
+        return self.contribution(Invoice._get_collection().find_one_and_delete(
+            {'_id': invoice_id}, projection=list(self.TRACKED_FIELDS)
+        ))
+
+    def contribution(self, raw):
+        """Map a raw invoice document to ((user, day, currency, status), amounts)"""
+        if not raw or not raw.get('issue_date'):
+            return None
+        issue_date = raw['issue_date']
+        key = (
+            raw['user'],
+            datetime(issue_date.year, issue_date.month, issue_date.day),
+            raw.get('currency') or 'EUR',
+            raw.get('status') or 'draft'
+        )
+        return key, {field: float(raw.get(field) or 0) for field in self.AMOUNT_FIELDS}
+
+    def record(self, previous, invoice):
+        """Apply the delta between `previous` and the saved state of `invoice`"""
+        self.apply(previous, self.contribution(invoice.to_mongo()))
+
+    def apply(self, previous, current):
+        """Move an invoice's contribution from `previous` to `current` with
+        atomic `$inc` upserts; either side may be None"""
+        if previous and current and previous[0] == current[0]:
+            deltas = {field: current[1][field] - previous[1][field] for field in self.AMOUNT_FIELDS}
+            self._increment(current[0], 0, deltas)
+            return
+
+        if previous:
+            self._increment(previous[0], -1, {field: -value for field, value in previous[1].items()})
+        if current:
+            self._increment(current[0], 1, current[1])
+
+    def apply_many(self, changes):
+        """Apply many (previous, current) moves, as `apply` does, with one
+        unordered bulk write of `$inc` upserts, one per touched bucket"""
+        buckets = {}
+        for previous, current in changes:
+            for contribution, sign in ((previous, -1), (current, 1)):
+                if not contribution:
+                    continue
+                key, amounts = contribution
+                bucket = buckets.setdefault(key, {'invoice_count': 0, **{field: 0.0 for field in self.AMOUNT_FIELDS}})
+                bucket['invoice_count'] += sign
+                for field, value in amounts.items():
+                    bucket[field] += sign * value
+
+        updates = []
+        for (user, day, currency, status), bucket in buckets.items():
+            inc = {field: round(value, 2) for field, value in bucket.items() if round(value, 2)}
+            if inc:
+                updates.append(UpdateOne(
+                    {'user': user, 'day': day, 'currency': currency, 'status': status},
+                    {'$inc': inc},
+                    upsert=True
+                ))
+        if updates:
+            RevenueRollup._get_collection().bulk_write(updates, ordered=False)
+
+    def _increment(self, key, count, amounts):
+        inc = {field: round(value, 2) for field, value in amounts.items() if round(value, 2)}
+        if count:
+            inc['invoice_count'] = count
+        if not inc:
+            return
+
+        user, day, currency, status = key
+        RevenueRollup._get_collection().update_one(
+            {'user': user, 'day': day, 'currency': currency, 'status': status},
+            {'$inc': inc},
+            upsert=True
+        )
+
+    def _raw_pipeline(self):
+        return [
+            {'$group': {
+                '_id': {
+                    'user': '$user',
+                    'day': {'$dateTrunc': {'date': '$issue_date', 'unit': 'day'}},
+                    'currency': {'$ifNull': ['$currency', 'EUR']},
+                    'status': {'$ifNull': ['$status', 'draft']}
+                },
+                'invoice_count': {'$sum': 1},
+                'total_amount': {'$sum': '$total_amount'},
+                'paid_amount': {'$sum': '$paid_amount'},
+                'balance_due': {'$sum': '$balance_due'}
+            }},
+            {'$project': {
+                '_id': 0,
+                'user': '$_id.user',
+                'day': '$_id.day',
+                'currency': '$_id.currency',
+                'status': '$_id.status',
+                'invoice_count': 1,
+                'total_amount': {'$round': ['$total_amount', 2]},
+                'paid_amount': {'$round': ['$paid_amount', 2]},
+                'balance_due': {'$round': ['$balance_due', 2]}
+            }}
+        ]
+
+    def rebuild(self, user_id=None):
+        """Recompute rollups from raw invoices, for one user or everyone.
+
+        Fresh buckets are aggregated server-side into a temporary collection
+        first, so readers never see missing rollups. A full rebuild renames
+        it over `revenue_rollups`; a per-user one merges it in and then drops
+        the user's buckets that no longer have invoices. Returns the number
+        of buckets.
+        """
+        invoices = Invoice.objects(user=user_id) if user_id else Invoice.objects
+        rollups = RevenueRollup.objects(user=user_id) if user_id else RevenueRollup.objects
+
+        RevenueRollup.ensure_indexes()
+        collection = RevenueRollup._get_collection()
+        staging = collection.database[f'{collection.name}_rebuild_{uuid4().hex}']
+        try:
+            for index in collection.index_information().values():
+                if index['key'] != [('_id', 1)]:
+                    staging.create_index(index['key'], unique=index.get('unique', False))
+            list(invoices.aggregate(self._raw_pipeline() + [{'$out': staging.name}]))
+
+            if not user_id:
+                staging.rename(collection.name, dropTarget=True)
+                return rollups.count()
+
+            list(staging.aggregate([
+                {'$project': {'_id': 0}},
+                {'$merge': {
+                    'into': collection.name,
+                    'on': ['user', 'day', 'currency', 'status'],
+                    'whenMatched': 'replace',
+                    'whenNotMatched': 'insert'
+                }}
+            ]))
+            fresh = {
+                (row['day'], row['currency'], row['status'])
+                for row in staging.find({}, {'_id': 0, 'day': 1, 'currency': 1, 'status': 1})
+            }
+            stale = [
+                row['_id'] for row in rollups.only('day', 'currency', 'status').as_pymongo()
+                if (row['day'], row['currency'], row['status']) not in fresh
+            ]
+            if stale:
+                collection.delete_many({'_id': {'$in': stale}})
+            return len(fresh)
+        finally:
+            staging.drop()
+
+    def check_consistency(self, user_id=None):
+        """Compare rollups with a fresh aggregation over raw invoices.
+
+        Returns a list of mismatching buckets, each with the expected
+        (raw) and actual (rollup) values; an empty list means consistent.
+        """
+        invoices = Invoice.objects(user=user_id) if user_id else Invoice.objects
+        rollups = RevenueRollup.objects(user=user_id) if user_id else RevenueRollup.objects
+
+        def bucket_key(row):
+            return (row['user'], row['day'], row['currency'], row['status'])
+
+        expected = {bucket_key(row): row for row in invoices.aggregate(self._raw_pipeline())}
+        actual = {bucket_key(row): row for row in rollups.as_pymongo()
+                  if row.get('invoice_count') or any(row.get(f) for f in self.AMOUNT_FIELDS)}
+
+        mismatches = []
+        for key in sorted(set(expected) | set(actual), key=lambda k: (str(k[0]), k[1], k[2], k[3])):
+            raw, rollup = expected.get(key, {}), actual.get(key, {})
+            values = ('invoice_count',) + self.AMOUNT_FIELDS
+            if any(abs(float(raw.get(f) or 0) - float(rollup.get(f) or 0)) > self.TOLERANCE for f in values):
+                mismatches.append({
+                    'user_id': str(key[0]),
+                    'day': key[1].date().isoformat(),
+                    'currency': key[2],
+                    'status': key[3],
+                    'expected': {f: raw.get(f, 0) for f in values},
+                    'actual': {f: rollup.get(f, 0) for f in values}
+                })
+        return mismatches
+
+revenue_rollup_service = RevenueRollupService()
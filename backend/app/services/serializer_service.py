@@ -0,0 +1,165 @@
+from decimal import Decimal, ROUND_HALF_UP
+import orjson
+from flask import Response
+
+CENT = Decimal('0.01')
+
+def _object_id(value):
+    return str(value) if value is not None else None
+
+def _amount(value):
+    return float(value or 0)
+
+def _list(value):
+    return value or []
+
+def _decimal(value):
+    """A stored amount as DecimalField(precision=2) loads it"""
+    return Decimal(str(value or 0)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+def _items(items):
+    """Invoice items with the same computed totals as InvoiceItem.to_dict,
+    worked out in Decimal so 3 x 0.15 stays 0.45"""
+    item_list = []
+    for item in items or ():
+        quantity = _decimal(item.get('quantity'))
+        unit_price = _decimal(item.get('unit_price'))
+        tax_rate = _decimal(item.get('tax_rate'))
+        discount_rate = _decimal(item.get('discount_rate'))
+        subtotal = quantity * unit_price
+        discount_amount = subtotal * (discount_rate / 100)
+        tax_amount = (subtotal - discount_amount) * (tax_rate / 100)
+        item_list.append({
+            'description': item.get('description'),
+            'quantity': float(quantity),
+            'unit_price': float(unit_price),
+            'tax_rate': float(tax_rate),
+            'discount_rate': float(discount_rate),
+            'subtotal': float(subtotal),
+            'discount_amount': float(discount_amount),
+            'tax_amount': float(tax_amount),
+            'total': float(subtotal - discount_amount + tax_amount)
+        })
+    return item_list
+
+class RawSerializer:
+    """Serialize raw `as_pymongo()` documents to JSON bytes with orjson.
+
+    Each model has a field map of (to_dict key, stored field, converter)
+    that mirrors its to_dict. Rows skip Document construction and Decimal
+    conversion, and datetimes are left for orjson, which writes the same
+    ISO 8601 strings as `isoformat()`.
+    """
+
+    FIELD_MAPS = {
+        'invoice': (
+            ('id', '_id', _object_id),
+            ('invoice_number', 'invoice_number', None),
+            ('user_id', 'user', _object_id),
+            ('client_id', 'client', _object_id),
+            ('issue_date', 'issue_date', None),
+            ('due_date', 'due_date', None),
+            ('sent_date', 'sent_date', None),
+            ('paid_date', 'paid_date', None),
+            ('status', 'status', None),
+            ('currency', 'currency', None),
+            ('subtotal', 'subtotal', _amount),
+            ('tax_total', 'tax_total', _amount),
+            ('discount_total', 'discount_total', _amount),
+            ('total_amount', 'total_amount', _amount),
+            ('paid_amount', 'paid_amount', _amount),
+            ('balance_due', 'balance_due', _amount),
+            ('items', 'items', _items),
+            ('shipping_fee', 'shipping_fee', _amount),
+            ('handling_fee', 'handling_fee', _amount),
+            ('notes', 'notes', None),
+            ('terms_conditions', 'terms_conditions', None),
+            ('payment_method', 'payment_method', None),
+            ('payment_reference', 'payment_reference', None),
+            ('pdf_path', 'pdf_path', None),
+            ('created_at', 'created_at', None),
+            ('updated_at', 'updated_at', None)
+        ),
+        'client': (
+            ('id', '_id', _object_id),
+            ('user_id', 'user', _object_id),
+            ('company_name', 'company_name', None),
+            ('contact_person', 'contact_person', None),
+            ('email', 'email', None),
+            ('phone', 'phone', None),
+            ('billing_address', 'billing_address', None),
+            ('billing_city', 'billing_city', None),
+            ('billing_state', 'billing_state', None),
+            ('billing_zip_code', 'billing_zip_code', None),
+            ('billing_country', 'billing_country', None),
+            ('shipping_address', 'shipping_address', None),
+            ('shipping_city', 'shipping_city', None),
+            ('shipping_state', 'shipping_state', None),
+            ('shipping_zip_code', 'shipping_zip_code', None),
+            ('shipping_country', 'shipping_country', None),
+            ('tax_id', 'tax_id', None),
+            ('notes', 'notes', None),
+            ('tags', 'tags', _list),
+            ('is_active', 'is_active', None),
+            ('created_at', 'created_at', None),
+            ('updated_at', 'updated_at', None)
+        ),
+        'payment': (
+            ('id', '_id', _object_id),
+            ('payment_id', 'payment_id', None),
+            ('invoice_id', 'invoice', _object_id),
+            ('user_id', 'user', _object_id),
+            ('client_id', 'client', _object_id),
+            ('amount', 'amount', _amount),
+            ('currency', 'currency', None),
+            ('payment_method', 'payment_method', None),
+            ('status', 'status', None),
+            ('provider', 'provider', None),
+            ('provider_payment_id', 'provider_payment_id', None),
+            ('provider_transaction_id', 'provider_transaction_id', None),
+            ('created_at', 'created_at', None),
+            ('processed_at', 'processed_at', None),
+            ('completed_at', 'completed_at', None),
+            ('description', 'description', None),
+            ('metadata', 'metadata', None),
+            ('error_message', 'error_message', None),
+            ('refunded_amount', 'refunded_amount', _amount),
+            ('refund_reason', 'refund_reason', None),
+            ('refunded_at', 'refunded_at', None)
+        )
+    }
+
+    def keys(self, model):
+        """to_dict keys a model can serialize"""
+        return [key for key, _, _ in self.FIELD_MAPS[model]]
+
+    def field_map(self, model, fields=None):
+        """Field map restricted to `fields` (to_dict keys); `id` is always kept"""
+        if fields is None:
+            return self.FIELD_MAPS[model]
+        fields = set(fields)
+        return tuple(entry for entry in self.FIELD_MAPS[model] if entry[0] == 'id' or entry[0] in fields)
+
+    def stored_fields(self, model, fields=None):
+        """Stored field names to pass to `.only()` for `fields`; `_id` is left
+        out since mongoengine always returns it and rejects the name"""
+        return [field for _, field, _ in self.field_map(model, fields) if field != '_id']
+
+    def serialize(self, model, row, fields=None):
+        return self.serialize_many(model, [row], fields)[0]
+
+    def serialize_many(self, model, rows, fields=None):
+        field_map = self.field_map(model, fields)
+        return [
+            {key: convert(row.get(field)) if convert else row.get(field) for key, field, convert in field_map}
+            for row in rows
+        ]
+
+    def dumps(self, payload):
+        return orjson.dumps(payload)
+
+    def response(self, payload, status=200):
+        """JSON Response built without going through Flask's json provider"""
+        return Response(self.dumps(payload), status=status, mimetype='application/json')
+
+raw_serializer = RawSerializer()
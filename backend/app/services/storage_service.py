@@ -0,0 +1,79 @@
+import os
+import shutil
+import logging
+from flask import send_file, redirect
+
+logger = logging.getLogger(__name__)
+
+class ArtifactStorage:
+    """Stores generated files on local disk or in S3.
+
+    Locations are returned as plain paths for local storage and as
+    ``s3://bucket/key`` URIs for S3, so either can be kept on a document.
+    """
+
+    def __init__(self):
+        self.backend = 'local'
+        self.root = None
+        self.bucket = None
+        self.region = None
+        self._s3 = None
+
+    def init_app(self, app):
+        self.backend = app.config['ARTIFACT_STORAGE']
+        self.root = app.config['ARTIFACT_STORAGE_DIR']
+        self.bucket = app.config.get('AWS_S3_BUCKET')
+        self.region = app.config.get('AWS_S3_REGION')
+        os.makedirs(self.root, exist_ok=True)
+
+    @property
+    def s3(self):
+        if self._s3 is None:
+            import boto3
+            self._s3 = boto3.client('s3', region_name=self.region)
+        return self._s3
+
+    def local_path(self, key):
+        """Path under the storage root for `key`, creating parent directories"""
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def store(self, source_path, key):
+        """Move a finished file into storage and return its location"""
+        if self.backend == 's3':
+            self.s3.upload_file(source_path, self.bucket, key)
+            os.remove(source_path)
+            return f's3://{self.bucket}/{key}'
+
+        destination = self.local_path(key)
+        if os.path.abspath(source_path) != os.path.abspath(destination):
+            shutil.move(source_path, destination)
+        return destination
+
+    def delete(self, location):
+        """Remove a stored file; missing files are ignored"""
+        try:
+            if location.startswith('s3://'):
+                bucket, key = location[len('s3://'):].split('/', 1)
+                self.s3.delete_object(Bucket=bucket, Key=key)
+            elif os.path.exists(location):
+                os.remove(location)
+        except Exception as e:
+            logger.error(f"Error deleting artifact {location}: {str(e)}")
+
+    def download_response(self, location, filename, mimetype=None):
+        """Response that delivers a stored file: the file itself for local
+        storage, a short-lived presigned redirect for S3"""
+        if location.startswith('s3://'):
+            bucket, key = location[len('s3://'):].split('/', 1)
+            url = self.s3.generate_presigned_url('get_object', Params={
+                'Bucket': bucket,
+                'Key': key,
+                'ResponseContentDisposition': f'attachment; filename={filename}'
+            }, ExpiresIn=300)
+            return redirect(url)
+
+        return send_file(location, mimetype=mimetype, as_attachment=True, download_name=filename)
+
+artifact_storage = ArtifactStorage()
@@ -0,0 +1,60 @@
+from flask import current_app, has_app_context
+from . import celery, create_app
+
+_flask_app = None
+
+def get_flask_app():
+    """Flask app for tasks; workers start without one, so build it once"""
+    global _flask_app
+    if has_app_context():
+        return current_app._get_current_object()
+    if _flask_app is None:
+        _flask_app = create_app()
+    return _flask_app
+
+class AppContextTask(celery.Task):
+    """Run every task inside a Flask application context"""
+    abstract = True
+
+    def __call__(self, *args, **kwargs):
+        with get_flask_app().app_context():
+            return super().__call__(*args, **kwargs)
+
+@celery.task(base=AppContextTask, bind=True, name='exports.run_export_job')
+def run_export_job(self, job_id):
+    """Generate the artifact for an export job"""
+    from .services.export_job_service import export_job_service
+    job = export_job_service.run(job_id, task_id=self.request.id)
+    return job.status if job else None
+
+@celery.task(base=AppContextTask, name='invoices.run_status_side_effects')
+def run_status_side_effects(action, user_id, invoice_ids):
+    """Send the emails and notifications that follow a bulk status change"""
+    from .services.invoice_service import InvoiceService
+    return InvoiceService().run_status_side_effects(action, user_id, invoice_ids)
+
+@celery.task(base=AppContextTask, name='pdfs.render_invoice_pdf')
+def render_invoice_pdf(invoice_id, key):
+    """Render an invoice PDF into the cache ahead of its first download"""
+    from .services.pdf_service import pdf_service
+    return pdf_service.render_claimed(invoice_id, key)
+
+@celery.task(base=AppContextTask, name='pdfs.render_batch')
+def render_pdf_batch(user_id=None, issued_from=None, issued_to=None, workers=None):
+    """Render a month-end batch of invoice PDFs on a process pool; dates are
+    ISO strings. Run it on a worker started with `--pool solo` or `--pool
+    threads`, since prefork children may not start processes of their own"""
+    from datetime import datetime
+    from .services.pdf_service import pdf_service
+    invoice_ids = pdf_service.batch_ids(
+        user_id,
+        datetime.fromisoformat(issued_from) if issued_from else None,
+        datetime.fromisoformat(issued_to) if issued_to else None
+    )
+    return pdf_service.render_batch(invoice_ids, workers)
+
+@celery.task(base=AppContextTask, name='exports.expire_export_jobs')
+def expire_export_jobs():
+    """Delete artifacts of export jobs past their retention"""
+    from .services.export_job_service import export_job_service
+    return export_job_service.expire_jobs()
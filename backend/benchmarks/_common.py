@@ -0,0 +1,99 @@
+"""Shared helpers for the backend benchmarks.
+
+Benchmarks run against a throwaway MongoDB database (``BENCH_MONGODB_URI``,
+default ``mongodb://localhost:27017/invoice_bench``) that is dropped and
+re-seeded for every dataset size.
+"""
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from statistics import median
+from bson import ObjectId
+from mongoengine import connect, disconnect
+from mongoengine.connection import get_db
+
+STATUSES = ['draft', 'sent', 'paid', 'overdue', 'cancelled']
+
+def connect_bench_db():
+    """Connect mongoengine to the benchmark database"""
+    disconnect()
+    connect(host=os.getenv('BENCH_MONGODB_URI', 'mongodb://localhost:27017/invoice_bench'))
+    return get_db()
+
+def seed(invoice_count, client_count=50, days=365, with_items=False, seed_value=42):
+    """Drop the benchmark database and insert one user, its clients and
+    `invoice_count` invoices spread over the last `days` days.
+
+    Returns the user id as a string, like ``get_jwt_identity()`` would.
+    """
+    from app.models import Invoice, Client, Payment, User
+
+    db = connect_bench_db()
+    db.client.drop_database(db.name)
+    for model in (User, Client, Invoice, Payment):
+        model.ensure_indexes()
+
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    user_id = ObjectId()
+    db.users.insert_one({
+        '_id': user_id, 'username': 'bench', 'email': 'bench@example.com',
+        'password_hash': '-', 'first_name': 'Bench', 'last_name': 'User',
+        'company_name': 'Bench Co', 'invoice_prefix': 'INV', 'next_invoice_number': '0001'
+    })
+
+    client_ids = [ObjectId() for _ in range(client_count)]
+    db.clients.insert_many([{
+        '_id': client_id, 'user': user_id, 'company_name': f'Client {i}',
+        'contact_person': f'Contact {i}', 'email': f'client{i}@example.com',
+        'billing_address': f'{i} Main Street', 'billing_city': 'Paris',
+        'billing_country': 'FR', 'is_active': True, 'tags': [],
+        'created_at': now, 'updated_at': now
+    } for i, client_id in enumerate(client_ids)])
+
+    batch = []
+    for i in range(invoice_count):
+        issue_date = now - timedelta(days=rng.uniform(0, days))
+        total = round(rng.uniform(50, 5000), 2)
+        status = rng.choice(STATUSES)
+        paid = total if status == 'paid' else 0.0
+        doc = {
+            'invoice_number': f'INV-{i + 1:07d}', 'user': user_id,
+            'client': rng.choice(client_ids), 'issue_date': issue_date,
+            'due_date': issue_date + timedelta(days=30), 'status': status,
+            'currency': 'EUR', 'subtotal': total, 'tax_total': 0.0,
+            'discount_total': 0.0, 'total_amount': total, 'paid_amount': paid,
+            'balance_due': round(total - paid, 2), 'shipping_fee': 0.0,
+            'handling_fee': 0.0, 'notes': 'Thank you for your business',
+            'terms_conditions': 'Payment due within 30 days',
+            'created_at': issue_date, 'updated_at': issue_date,
+            'items': [{
+                'description': f'Item {n}', 'quantity': 1.0, 'unit_price': total / 5,
+                'tax_rate': 0.0, 'discount_rate': 0.0
+            } for n in range(5 if with_items else 1)]
+        }
+        batch.append(doc)
+        if len(batch) == 10000:
+            db.invoices.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db.invoices.insert_many(batch, ordered=False)
+
+    return str(user_id)
+
+def timeit(fn, repeat=5):
+    """Run `fn` `repeat` times and return the median wall time in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return median(timings)
+
+def print_table(headers, rows):
+    """Print a fixed-width results table"""
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print('  '.join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print('  '.join(str(c).rjust(w) for c, w in zip(row, widths)))
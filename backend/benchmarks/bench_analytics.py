@@ -0,0 +1,60 @@
+"""Monthly revenue and per-client totals: Python loops vs NumPy vs aggregation.
+
+"loop" is the previous per-Document Decimal accumulation, "numpy" is the
+opt-in AnalyticsService engine and "aggregation" the default MongoDB engine
+(revenue rollups plus a `$group` for client totals).
+
+    cd backend && python -m benchmarks.bench_analytics [sizes...]
+"""
+import sys
+from datetime import datetime, timedelta
+from decimal import Decimal
+from ._common import seed, timeit, print_table
+
+def loop_reports(user_id, start_date, end_date):
+    from app.models import Invoice
+
+    monthly_data = {}
+    client_data = {}
+    for invoice in Invoice.objects(user=user_id, issue_date__gte=start_date, issue_date__lte=end_date):
+        month_key = invoice.issue_date.strftime('%Y-%m')
+        month = monthly_data.setdefault(month_key, {'total_amount': Decimal('0.0'), 'total_paid': Decimal('0.0')})
+        month['total_amount'] += invoice.total_amount
+        if invoice.status == 'paid':
+            month['total_paid'] += invoice.total_amount
+        client = client_data.setdefault(invoice.client.pk, [Decimal('0.0'), Decimal('0.0')])
+        client[0] += invoice.total_amount
+        client[1] += invoice.paid_amount
+
+def numpy_reports(user_id, start_date, end_date):
+    from app.services.analytics_service import analytics_service
+
+    columns = analytics_service.load_invoice_columns(user_id, start_date, end_date)
+    analytics_service.revenue_by_period(columns, 'month')
+    analytics_service.client_totals(columns)
+
+def aggregation_reports(user_id, start_date, end_date):
+    from app.services.report_service import ReportService
+
+    report_service = ReportService(engine='aggregation')
+    report_service.get_revenue_by_month(user_id, start_date, end_date)
+    report_service.get_client_totals(user_id, start_date, end_date)
+
+def main(sizes):
+    from app.services.rollup_service import revenue_rollup_service
+
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=365)
+    rows = []
+    for size in sizes:
+        user_id = seed(size, client_count=1000)
+        revenue_rollup_service.rebuild(user_id)
+        loop_ms = timeit(lambda: loop_reports(user_id, start_date, end_date), repeat=1 if size >= 10 ** 6 else 3)
+        numpy_ms = timeit(lambda: numpy_reports(user_id, start_date, end_date))
+        aggregation_ms = timeit(lambda: aggregation_reports(user_id, start_date, end_date))
+        rows.append((size, f'{loop_ms:.0f}', f'{numpy_ms:.0f}', f'{aggregation_ms:.0f}',
+                     f'{loop_ms / numpy_ms:.1f}x'))
+    print_table(('invoices', 'loop ms', 'numpy ms', 'aggregation ms', 'numpy vs loop'), rows)
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000])
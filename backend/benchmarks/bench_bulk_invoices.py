@@ -0,0 +1,62 @@
+"""Invoice creation throughput: one-by-one vs POST /api/invoices/bulk.
+
+"single" repeats what POST /api/invoices does per invoice (client and user
+lookups, number generation, save with its rollup and cache hooks); "bulk" is
+InvoiceService.create_invoices_bulk over the same payloads.
+
+    cd backend && python -m benchmarks.bench_bulk_invoices [batch sizes...]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+from ._common import seed, print_table
+
+def payloads(client_ids, count):
+    due_date = (datetime.utcnow() + timedelta(days=30)).isoformat()
+    return [{
+        'client_id': client_ids[i % len(client_ids)],
+        'due_date': due_date,
+        'items': [
+            {'description': 'Consulting', 'quantity': 3, 'unit_price': 120.5, 'tax_rate': 20},
+            {'description': 'Travel', 'quantity': 1, 'unit_price': 80, 'discount_rate': 10}
+        ]
+    } for i in range(count)]
+
+def create_single(invoice_service, user_id, rows):
+    from app.models import Client, User
+
+    for data in rows:
+        client = Client.objects(id=data['client_id'], user=user_id).first()
+        user = User.objects(id=user_id).first()
+        invoice_number = invoice_service.generate_invoice_number(user)
+        invoice_service.build_invoice(user, client, data, invoice_number).save()
+
+def create_bulk(invoice_service, user_id, rows):
+    from app.models import User
+
+    results = invoice_service.create_invoices_bulk(User.objects(id=user_id).first(), rows)
+    if any(result['status'] != 'created' for result in results):
+        sys.exit('Bulk creation rejected valid invoices')
+
+def throughput(fn, count):
+    started = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - started)
+
+def main(sizes):
+    from app.models import Client
+    from app.services.invoice_service import InvoiceService
+
+    invoice_service = InvoiceService()
+    rows = []
+    for size in sizes:
+        user_id = seed(0, client_count=100)
+        client_ids = [str(client.pk) for client in Client.objects(user=user_id).only('id')]
+        batch = payloads(client_ids, size)
+        single_rate = throughput(lambda: create_single(invoice_service, user_id, batch[:min(size, 500)]), min(size, 500))
+        bulk_rate = throughput(lambda: create_bulk(invoice_service, user_id, batch), size)
+        rows.append((size, f'{single_rate:.0f}', f'{bulk_rate:.0f}', f'{bulk_rate / single_rate:.0f}x'))
+    print_table(('batch', 'single inv/s', 'bulk inv/s', 'speedup'), rows)
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000])
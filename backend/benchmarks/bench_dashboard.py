@@ -0,0 +1,49 @@
+"""Dashboard latency versus invoice count.
+
+Compares the previous per-Document Python loops with
+``ReportService.get_dashboard_summary`` on the ``aggregation`` engine (one
+``$facet`` aggregation) and on the ``numpy`` engine.
+
+    cd backend && python -m benchmarks.bench_dashboard [sizes...]
+"""
+import sys
+from datetime import datetime, timedelta
+from ._common import seed, timeit, print_table
+
+def legacy_dashboard(user_id, start_date, end_date):
+    from app.models import Invoice, Payment
+
+    invoices = Invoice.objects(user=user_id, issue_date__gte=start_date, issue_date__lte=end_date)
+    payments = Payment.objects(user=user_id, created_at__gte=start_date, created_at__lte=end_date)
+    invoices.count()
+    sum(invoice.total_amount for invoice in invoices)
+    sum(payment.amount for payment in payments if payment.status == 'completed')
+    sum(invoice.balance_due for invoice in invoices if invoice.status in ['sent', 'draft'])
+    status_counts = {}
+    for invoice in invoices:
+        status_counts[invoice.status] = status_counts.get(invoice.status, 0) + 1
+    monthly = {}
+    for invoice in Invoice.objects(user=user_id, issue_date__gte=start_date, issue_date__lte=end_date):
+        month_key = invoice.issue_date.strftime('%Y-%m')
+        monthly[month_key] = monthly.get(month_key, 0) + invoice.total_amount
+
+def main(sizes):
+    from app.services.report_service import ReportService
+
+    facet_service = ReportService(engine='aggregation')
+    numpy_service = ReportService(engine='numpy')
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=30)
+    rows = []
+    for size in sizes:
+        # Spread over a year so the 30 day window holds roughly size / 12 invoices
+        user_id = seed(size, days=365)
+        legacy_ms = timeit(lambda: legacy_dashboard(user_id, start_date, end_date), repeat=3)
+        facet_ms = timeit(lambda: facet_service.get_dashboard_summary(user_id, start_date, end_date))
+        numpy_ms = timeit(lambda: numpy_service.get_dashboard_summary(user_id, start_date, end_date))
+        rows.append((size, f'{legacy_ms:.1f}', f'{facet_ms:.1f}', f'{numpy_ms:.1f}',
+                     f'{legacy_ms / min(facet_ms, numpy_ms):.1f}x'))
+    print_table(('invoices', 'legacy ms', '$facet ms', 'numpy ms', 'best speedup'), rows)
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000, 500000])
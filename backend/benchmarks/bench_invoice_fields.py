@@ -0,0 +1,71 @@
+"""Bytes over the wire and latency of an invoice list page: full documents vs
+the lean list projection.
+
+"full" reads whole invoice documents (items, notes and terms included) and
+serializes every to_dict key, as GET /api/invoices did before `fields=`;
+"lean" is the default list projection read with `.only()`/`as_pymongo()`.
+Wire bytes are the BSON size of the find/getMore replies.
+
+    cd backend && python -m benchmarks.bench_invoice_fields [page sizes...]
+"""
+import json
+import sys
+import bson
+from pymongo import monitoring
+from ._common import seed, timeit, print_table
+
+class ReplySizeCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.bytes = 0
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        if event.command_name in ('find', 'getMore'):
+            self.bytes += len(bson.encode(event.reply))
+
+    def failed(self, event):
+        pass
+
+counter = ReplySizeCounter()
+monitoring.register(counter)
+
+def full_page(user_id, per_page):
+    from app.models import Invoice
+    from app.services.invoice_service import InvoiceService
+
+    invoices = Invoice.objects(user=user_id).order_by('-created_at').limit(per_page).as_pymongo()
+    return InvoiceService().serialize_invoice_rows(invoices)
+
+def lean_page(user_id, per_page):
+    from app.models import Invoice
+    from app.services.invoice_service import InvoiceService
+
+    invoice_service = InvoiceService()
+    fields = invoice_service.list_fields()
+    rows = invoice_service.list_queryset(Invoice.objects(user=user_id), fields).order_by('-created_at').limit(per_page)
+    return invoice_service.serialize_invoice_rows(rows, fields)
+
+def measure(fn):
+    counter.bytes = 0
+    body = json.dumps(fn())
+    return counter.bytes, len(body)
+
+def main(page_sizes):
+    user_id = seed(max(page_sizes) * 2, with_items=True)
+    rows = []
+    for per_page in page_sizes:
+        full_wire, full_json = measure(lambda: full_page(user_id, per_page))
+        lean_wire, lean_json = measure(lambda: lean_page(user_id, per_page))
+        full_ms = timeit(lambda: full_page(user_id, per_page))
+        lean_ms = timeit(lambda: lean_page(user_id, per_page))
+        rows.append((
+            per_page, full_wire, lean_wire, f'{1 - lean_wire / full_wire:.0%}',
+            full_json, lean_json, f'{full_ms:.1f}', f'{lean_ms:.1f}'
+        ))
+    print_table(('per_page', 'full wire B', 'lean wire B', 'saved', 'full JSON B', 'lean JSON B',
+                 'full ms', 'lean ms'), rows)
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10, 50, 100])
@@ -0,0 +1,73 @@
+"""Database round trips and latency for one page of GET /api/invoices.
+
+Counts the commands sent to MongoDB while serializing a page with the
+previous per-invoice dereferencing and with the route's path (lean
+projection, clients loaded with one `$in`), and exits non-zero if the
+batched path stops being constant per page.
+
+    cd backend && python -m benchmarks.bench_invoice_list [page sizes...]
+"""
+import sys
+from pymongo import monitoring
+from ._common import seed, timeit, print_table
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+counter = CommandCounter()
+monitoring.register(counter)
+
+def legacy_page(user_id, per_page):
+    from app.models import Invoice
+
+    invoice_list = []
+    for invoice in Invoice.objects(user=user_id).order_by('-created_at').limit(per_page):
+        invoice_data = invoice.to_dict()
+        invoice_data['client'] = invoice.client.to_dict() if invoice.client else None
+        invoice_list.append(invoice_data)
+    return invoice_list
+
+def batched_page(user_id, per_page):
+    from app.models import Invoice
+    from app.services.invoice_service import InvoiceService
+
+    invoice_service = InvoiceService()
+    fields = invoice_service.list_fields()
+    rows = invoice_service.list_queryset(Invoice.objects(user=user_id), fields).order_by('-created_at').limit(per_page)
+    return invoice_service.serialize_invoice_rows(rows, fields)
+
+def round_trips(fn):
+    counter.count = 0
+    fn()
+    return counter.count
+
+def main(page_sizes):
+    user_id = seed(max(page_sizes) * 2, client_count=max(page_sizes))
+    rows = []
+    batched_counts = set()
+    for per_page in page_sizes:
+        legacy_trips = round_trips(lambda: legacy_page(user_id, per_page))
+        batched_trips = round_trips(lambda: batched_page(user_id, per_page))
+        batched_counts.add(batched_trips)
+        rows.append((
+            per_page, legacy_trips, batched_trips,
+            f'{timeit(lambda: legacy_page(user_id, per_page)):.1f}',
+            f'{timeit(lambda: batched_page(user_id, per_page)):.1f}'
+        ))
+    print_table(('per_page', 'legacy trips', 'batched trips', 'legacy ms', 'batched ms'), rows)
+
+    if len(batched_counts) != 1 or max(batched_counts) > 2:
+        sys.exit(f'Batched invoice page is not a constant 2 round trips: {sorted(batched_counts)}')
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10, 50, 100])
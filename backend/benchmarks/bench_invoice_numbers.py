@@ -0,0 +1,67 @@
+"""Invoice numbering: the previous probe loop vs the per-user counter.
+
+Seeds another tenant that already issued INV-0001..INV-<n>, then numbers
+invoices for a new tenant. The probe loop walks past every existing number
+one query at a time; the counter is one `find_one_and_update`. The counter
+is also run from several threads and exits non-zero on duplicate numbers.
+
+    cd backend && python -m benchmarks.bench_invoice_numbers [existing numbers] [threads]
+"""
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from bson import ObjectId
+from ._common import connect_bench_db, timeit, print_table
+
+NUMBERS_PER_THREAD = 200
+
+def legacy_number(prefix, next_number):
+    from app.models import Invoice
+
+    while True:
+        invoice_number = f"{prefix}-{next_number}"
+        if not Invoice.objects(invoice_number=invoice_number).first():
+            break
+        next_number = str(int(next_number) + 1).zfill(4)
+    return invoice_number
+
+def seed_tenants(existing):
+    from app.models import Invoice, InvoiceCounter, User
+
+    db = connect_bench_db()
+    db.client.drop_database(db.name)
+    for model in (Invoice, InvoiceCounter):
+        model.ensure_indexes()
+    # The probe loop looked numbers up across tenants, so give it the index it used
+    db.invoices.create_index('invoice_number')
+
+    other_tenant = ObjectId()
+    db.invoices.insert_many([
+        {'invoice_number': f'INV-{i:04d}', 'user': other_tenant} for i in range(1, existing + 1)
+    ])
+    user = User(username='bench', email='bench@example.com', password_hash='-',
+                first_name='Bench', last_name='User', invoice_prefix='INV', next_invoice_number='0001')
+    user.save()
+    return user
+
+def main(existing, threads):
+    from app.services.invoice_service import InvoiceService
+
+    invoice_service = InvoiceService()
+    user = seed_tenants(existing)
+
+    legacy_ms = timeit(lambda: legacy_number(user.invoice_prefix, user.next_invoice_number), repeat=3)
+    counter_ms = timeit(lambda: invoice_service.generate_invoice_number(user))
+    print_table(('existing numbers', 'probe loop ms', 'counter ms'),
+                [(existing, f'{legacy_ms:.1f}', f'{counter_ms:.2f}')])
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        numbers = list(pool.map(lambda _: invoice_service.generate_invoice_number(user),
+                                range(threads * NUMBERS_PER_THREAD)))
+    duplicates = len(numbers) - len(set(numbers))
+    print(f'{len(numbers)} numbers from {threads} threads, {duplicates} duplicates')
+    if duplicates:
+        sys.exit('Concurrent invoice numbering produced duplicates')
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(args[0] if args else 5000, args[1] if len(args) > 1 else 8)
@@ -0,0 +1,56 @@
+"""Offset (skip) vs keyset (cursor) pagination of GET /api/invoices.
+
+Fetches page 1 and a deep page of the invoice list both ways. Skip has to
+walk every preceding index entry, so its latency grows with the page number;
+the cursor seeks straight to the position through the
+('user', '-created_at', '-id') index.
+
+    cd backend && python -m benchmarks.bench_pagination [invoices] [deep page]
+"""
+import sys
+from ._common import seed, timeit, print_table
+
+PER_PAGE = 20
+
+def skip_page(user_id, page):
+    from app.models import Invoice
+    from app.services.pagination import paginate
+
+    return paginate(Invoice.objects(user=user_id), 'created_at', PER_PAGE, page=page, descending=True)
+
+def cursor_page(user_id, cursor):
+    from app.models import Invoice
+    from app.services.pagination import paginate
+
+    return paginate(Invoice.objects(user=user_id), 'created_at', PER_PAGE, cursor=cursor, descending=True)
+
+def cursor_for_page(user_id, page):
+    """Cursor that a client walking the list would hold when asking for `page`"""
+    from app.models import Invoice
+    from app.services.pagination import cursor_after
+
+    if page == 1:
+        return ''
+    previous = Invoice.objects(user=user_id).order_by('-created_at', '-id').skip((page - 1) * PER_PAGE - 1).first()
+    return cursor_after(previous, 'created_at')
+
+def main(invoice_count, deep_page):
+    user_id = seed(invoice_count)
+    rows = []
+    for page in (1, deep_page):
+        cursor = cursor_for_page(user_id, page)
+        skipped, _ = skip_page(user_id, page)
+        seeked, _ = cursor_page(user_id, cursor)
+        if [doc.pk for doc in skipped] != [doc.pk for doc in seeked]:
+            sys.exit(f'Skip and cursor pagination disagree on page {page}')
+        rows.append((
+            page,
+            f'{timeit(lambda: skip_page(user_id, page)):.2f}',
+            f'{timeit(lambda: cursor_page(user_id, cursor)):.2f}'
+        ))
+    print_table(('page', 'skip ms', 'cursor ms'), rows)
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    invoice_count = args[0] if args else 200000
+    main(invoice_count, args[1] if len(args) > 1 else invoice_count // PER_PAGE // 2)
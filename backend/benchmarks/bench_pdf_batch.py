@@ -0,0 +1,46 @@
+"""Batch PDF rendering throughput by process count.
+
+Seeds invoices with items, then runs PdfService.render_batch into an empty
+cache directory with 1, 2, 4, ... processes up to the CPUs available.
+Efficiency is the speedup divided by the process count; ReportLab is pure
+CPU work, so it should stay close to 1 until cores run out.
+
+    cd backend && python -m benchmarks.bench_pdf_batch [invoices] [max processes]
+"""
+import sys
+import tempfile
+import time
+from ._common import seed, print_table
+
+def process_counts(limit):
+    count = 1
+    while count < limit:
+        yield count
+        count *= 2
+    yield limit
+
+def main(invoice_count, max_workers):
+    from app.services.pdf_service import pdf_service
+
+    seed(invoice_count, with_items=True)
+    invoice_ids = pdf_service.batch_ids()
+    pdf_service.redis = None
+
+    rows = []
+    baseline = None
+    for workers in process_counts(max_workers or pdf_service.worker_count()):
+        with tempfile.TemporaryDirectory() as root:
+            pdf_service.root = root
+            started = time.perf_counter()
+            stats = pdf_service.render_batch(invoice_ids, workers)
+            elapsed = time.perf_counter() - started
+        if stats['rendered'] != len(invoice_ids):
+            sys.exit(f"Rendered {stats['rendered']} of {len(invoice_ids)} invoices")
+        rate = len(invoice_ids) / elapsed
+        baseline = baseline or rate
+        rows.append((workers, f'{rate:.0f}', f'{rate / baseline:.2f}x', f'{rate / baseline / workers:.0%}'))
+    print_table(('processes', 'PDFs/s', 'speedup', 'efficiency'), rows)
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(args[0] if args else 2000, args[1] if len(args) > 1 else None)
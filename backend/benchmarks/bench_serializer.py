@@ -0,0 +1,69 @@
+"""Serialization of a 100-invoice page: Document.to_dict + json vs raw rows + orjson.
+
+Runs in memory (no database). "to_dict" builds Invoice documents from the
+raw rows and encodes their to_dict output with the json module, as the
+routes did; "raw" is RawSerializer over the same rows. Exits non-zero if
+the output differs from to_dict or the raw path is less than 5x faster.
+
+    cd backend && python -m benchmarks.bench_serializer [page size]
+"""
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+from bson import ObjectId
+from ._common import timeit, print_table
+
+TARGET_SPEEDUP = 5
+
+def sample_rows(count, items_per_invoice=5, seed_value=42):
+    """Raw invoice documents shaped like what `as_pymongo()` returns"""
+    rng = random.Random(seed_value)
+    now = datetime.utcnow().replace(microsecond=123000)
+    user_id, client_id = ObjectId(), ObjectId()
+    rows = []
+    for i in range(count):
+        issue_date = now - timedelta(days=rng.randint(0, 365))
+        total = round(rng.uniform(50, 5000), 2)
+        rows.append({
+            '_id': ObjectId(), 'invoice_number': f'INV-{i + 1:07d}', 'user': user_id, 'client': client_id,
+            'issue_date': issue_date, 'due_date': issue_date + timedelta(days=30), 'status': 'sent',
+            'currency': 'EUR', 'subtotal': total, 'tax_total': 0.0, 'discount_total': 0.0,
+            'total_amount': total, 'paid_amount': 0.0, 'balance_due': total, 'shipping_fee': 0.0,
+            'handling_fee': 0.0, 'notes': 'Thank you for your business',
+            'terms_conditions': 'Payment due within 30 days', 'created_at': issue_date, 'updated_at': issue_date,
+            'items': [{
+                'description': f'Item {n}', 'quantity': 2.0, 'unit_price': round(total / 10, 2),
+                'tax_rate': 20.0, 'discount_rate': 5.0
+            } for n in range(items_per_invoice)]
+        })
+    return rows
+
+def to_dict_page(rows):
+    from app.models import Invoice
+
+    return json.dumps([Invoice._from_son(row).to_dict() for row in rows]).encode()
+
+def raw_page(rows):
+    from app.services.serializer_service import raw_serializer
+
+    return raw_serializer.dumps(raw_serializer.serialize_many('invoice', rows))
+
+def main(page_size):
+    rows = sample_rows(page_size)
+    expected = json.loads(to_dict_page(rows))
+    actual = json.loads(raw_page(rows))
+    if expected != actual:
+        sys.exit('Raw serializer output differs from Invoice.to_dict')
+
+    to_dict_ms = timeit(lambda: to_dict_page(rows), repeat=21)
+    raw_ms = timeit(lambda: raw_page(rows), repeat=21)
+    speedup = to_dict_ms / raw_ms
+    print_table(('invoices', 'to_dict ms', 'raw ms', 'speedup'),
+                [(page_size, f'{to_dict_ms:.2f}', f'{raw_ms:.2f}', f'{speedup:.1f}x')])
+
+    if speedup < TARGET_SPEEDUP:
+        sys.exit(f'Raw serializer is only {speedup:.1f}x faster (target {TARGET_SPEEDUP}x)')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
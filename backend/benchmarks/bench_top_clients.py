@@ -0,0 +1,28 @@
+"""Top-clients aggregation latency against the 50 ms budget.
+
+    cd backend && python -m benchmarks.bench_top_clients [sizes...]
+"""
+import sys
+from datetime import datetime, timedelta
+from ._common import seed, timeit, print_table
+
+BUDGET_MS = 50
+
+def main(sizes):
+    from app.services.report_service import ReportService
+
+    report_service = ReportService()
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=365)
+    rows = []
+    for size in sizes:
+        user_id = seed(size, client_count=500)
+        by_billed = timeit(lambda: report_service.get_top_clients(user_id, start_date, end_date))
+        by_paid = timeit(lambda: report_service.get_top_clients(
+            user_id, start_date, end_date, sort_by='total_paid'))
+        verdict = 'ok' if max(by_billed, by_paid) <= BUDGET_MS else 'OVER BUDGET'
+        rows.append((size, f'{by_billed:.1f}', f'{by_paid:.1f}', verdict))
+    print_table(('invoices', 'by billed ms', 'by paid ms', f'<= {BUDGET_MS} ms'), rows)
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000])
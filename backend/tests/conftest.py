@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+import mongomock
+import pytest
+from bson import ObjectId
+from mongoengine import connect, disconnect
+from mongoengine.connection import get_db
+
+@pytest.fixture
+def db():
+    """In-memory MongoDB (mongomock) behind the mongoengine default connection"""
+    disconnect()
+    connect('invoice_test', mongo_client_class=mongomock.MongoClient, uuidRepresentation='standard')
+    yield get_db()
+    disconnect()
+
+@pytest.fixture
+def query_counter(db, monkeypatch):
+    """Count reads (find and aggregate calls) sent to the database"""
+    counts = {'find': 0, 'aggregate': 0}
+
+    def counting(name):
+        original = getattr(mongomock.collection.Collection, name)
+
+        def wrapper(self, *args, **kwargs):
+            counts[name] += 1
+            return original(self, *args, **kwargs)
+        return wrapper
+
+    for name in counts:
+        monkeypatch.setattr(mongomock.collection.Collection, name, counting(name))
+
+    class Counter:
+        def reset(self):
+            for name in counts:
+                counts[name] = 0
+
+        @property
+        def total(self):
+            return sum(counts.values())
+
+    return Counter()
+
+@pytest.fixture
+def seed_invoices(db):
+    """Insert a user, `client_count` clients and `count` invoices as raw
+    documents; returns the user id"""
+    def seed(count, client_count=5):
+        now = datetime(2024, 3, 1)
+        user_id = ObjectId()
+        db.users.insert_one({
+            '_id': user_id, 'username': 'test', 'email': 'test@example.com', 'password_hash': '-',
+            'first_name': 'Test', 'last_name': 'User', 'company_name': 'Test Co'
+        })
+        client_ids = [ObjectId() for _ in range(client_count)]
+        db.clients.insert_many([{
+            '_id': client_id, 'user': user_id, 'company_name': f'Client {i}', 'contact_person': f'Contact {i}',
+            'email': f'client{i}@example.com', 'billing_address': f'{i} High St', 'billing_city': 'Paris',
+            'billing_zip_code': '75001', 'billing_country': 'France', 'is_active': True,
+            'created_at': now, 'updated_at': now
+        } for i, client_id in enumerate(client_ids)])
+        db.invoices.insert_many([{
+            'invoice_number': f'INV-{i + 1:04d}', 'user': user_id, 'client': client_ids[i % client_count],
+            'issue_date': now - timedelta(days=i), 'due_date': now + timedelta(days=30), 'status': 'sent',
+            'currency': 'EUR', 'subtotal': 100.0, 'tax_total': 20.0, 'discount_total': 0.0,
+            'total_amount': 120.0, 'paid_amount': 0.0, 'balance_due': 120.0, 'shipping_fee': 0.0,
+            'handling_fee': 0.0, 'created_at': now - timedelta(minutes=i), 'updated_at': now,
+            'items': [{'description': 'Consulting', 'quantity': 1.0, 'unit_price': 100.0,
+                       'tax_rate': 20.0, 'discount_rate': 0.0}]
+        } for i in range(count)])
+        return user_id
+    return seed
+
+@pytest.fixture
+def api(db):
+    """Test client for the invoice and client routes (create_app needs
+    Redis, Celery and Babel, so only the blueprints are mounted)"""
+    from flask import Flask
+    from flask_jwt_extended import JWTManager, create_access_token
+    from app.routes.invoices import invoices_bp
+    from app.routes.clients import clients_bp
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key-for-signing-tokens'
+    JWTManager(app)
+    app.register_blueprint(invoices_bp, url_prefix='/api/invoices')
+    app.register_blueprint(clients_bp, url_prefix='/api/clients')
+
+    class Api:
+        client = app.test_client()
+
+        def get(self, path, user_id, etag=None):
+            with app.app_context():
+                headers = {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+            if etag:
+                headers['If-None-Match'] = etag
+            return self.client.get(path, headers=headers)
+
+        def post(self, path, user_id, json):
+            with app.app_context():
+                headers = {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+            return self.client.post(path, headers=headers, json=json)
+
+    return Api()
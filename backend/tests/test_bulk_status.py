@@ -0,0 +1,67 @@
+import pytest
+from app.models import Invoice
+from app.services.invoice_service import InvoiceService
+from app.services.notification_service import NotificationService
+
+@pytest.fixture
+def notified(monkeypatch):
+    sent = []
+    monkeypatch.setattr(NotificationService, 'send_invoice_notification',
+                        lambda self, user_id, invoice, action: sent.append((invoice.invoice_number, action)))
+    return sent
+
+def statuses():
+    return {invoice['invoice_number']: invoice['status'] for invoice in Invoice.objects.as_pymongo()}
+
+def broken_broker(*args, **kwargs):
+    raise ConnectionError('broker down')
+
+def test_mark_paid_reports_a_failed_enqueue(api, seed_invoices, monkeypatch):
+    user_id = seed_invoices(2)
+    monkeypatch.setattr('app.tasks.run_status_side_effects.delay', broken_broker)
+    ids = [str(invoice.pk) for invoice in Invoice.objects]
+
+    response = api.post('/api/invoices/bulk-status', user_id, {'action': 'mark_paid', 'invoice_ids': ids})
+
+    assert response.status_code == 200
+    assert sorted(response.get_json()['transitioned']) == sorted(ids)
+    assert response.get_json()['notifications_queued'] is False
+    assert set(statuses().values()) == {'paid'}
+
+def test_send_changes_nothing_when_it_cannot_be_queued(api, seed_invoices, db, monkeypatch):
+    user_id = seed_invoices(2)
+    db.invoices.update_many({}, {'$set': {'status': 'draft'}})
+    monkeypatch.setattr('app.tasks.run_status_side_effects.delay', broken_broker)
+    ids = [str(invoice.pk) for invoice in Invoice.objects]
+
+    response = api.post('/api/invoices/bulk-status', user_id, {'action': 'send', 'invoice_ids': ids})
+
+    assert response.status_code == 503
+    assert set(statuses().values()) == {'draft'}
+
+def test_send_queues_drafts_without_marking_them(api, seed_invoices, db, monkeypatch):
+    user_id = seed_invoices(3)
+    db.invoices.update_many({'invoice_number': {'$ne': 'INV-0003'}}, {'$set': {'status': 'draft'}})
+    queued = []
+    monkeypatch.setattr('app.tasks.run_status_side_effects.delay', lambda *args: queued.append(args))
+    ids = [str(invoice.pk) for invoice in Invoice.objects]
+
+    response = api.post('/api/invoices/bulk-status', user_id, {'action': 'send', 'invoice_ids': ids})
+
+    assert response.status_code == 202
+    assert len(response.get_json()['queued']) == 2 and len(response.get_json()['skipped']) == 1
+    assert queued == [('send', str(user_id), response.get_json()['queued'])]
+    assert statuses() == {'INV-0001': 'draft', 'INV-0002': 'draft', 'INV-0003': 'sent'}
+
+def test_worker_marks_sent_only_delivered_invoices(seed_invoices, db, monkeypatch, notified):
+    user_id = seed_invoices(3)
+    db.invoices.update_many({}, {'$set': {'status': 'draft'}})
+    service = InvoiceService()
+    monkeypatch.setattr(service, 'send_invoice_email', lambda invoice: invoice.invoice_number != 'INV-0002')
+    ids = [str(invoice.pk) for invoice in Invoice.objects]
+
+    sent = service.run_status_side_effects('send', str(user_id), ids)
+
+    assert len(sent) == 2
+    assert statuses() == {'INV-0001': 'sent', 'INV-0002': 'draft', 'INV-0003': 'sent'}
+    assert sorted(notified) == [('INV-0001', 'sent'), ('INV-0003', 'sent')]
@@ -0,0 +1,52 @@
+from app.models import Client, Invoice
+from app.services.serializer_service import raw_serializer
+
+def test_unchanged_invoice_list_is_304_without_serializing(api, seed_invoices, monkeypatch):
+    user_id = seed_invoices(5)
+    first = api.get('/api/invoices/?fields=invoice_number,client', user_id)
+    assert first.status_code == 200
+
+    def fail(*args, **kwargs):
+        raise AssertionError('serialized a 304')
+    monkeypatch.setattr(raw_serializer, 'serialize_many', fail)
+
+    cached = api.get('/api/invoices/?fields=invoice_number,client', user_id, first.headers['ETag'])
+    assert cached.status_code == 304
+    assert cached.headers['ETag'] == first.headers['ETag']
+
+def test_invoice_list_etag_changes_with_rows_and_clients(api, seed_invoices):
+    user_id = seed_invoices(3)
+    etag = api.get('/api/invoices/?fields=invoice_number,client', user_id).headers['ETag']
+
+    client = Client.objects.first()
+    client.contact_person = 'Someone else'
+    client.save()
+    changed = api.get('/api/invoices/?fields=invoice_number,client', user_id, etag)
+    assert changed.status_code == 200
+
+    invoice = Invoice.objects.first()
+    invoice.notes = 'Changed'
+    invoice.save()
+    assert api.get('/api/invoices/?fields=invoice_number,client', user_id, changed.headers['ETag']).status_code == 200
+
+def test_invoice_detail_is_304_until_its_client_changes(api, seed_invoices):
+    user_id = seed_invoices(1)
+    invoice = Invoice.objects.first()
+    path = f'/api/invoices/{invoice.pk}'
+
+    first = api.get(path, user_id)
+    assert first.status_code == 200
+    assert first.get_json()['invoice']['client']['company_name'] == 'Client 0'
+    assert api.get(path, user_id, first.headers['ETag']).status_code == 304
+
+    client = Client.objects(id=invoice.client.pk).first()
+    client.company_name = 'Renamed'
+    client.save()
+    assert api.get(path, user_id, first.headers['ETag']).status_code == 200
+
+def test_unchanged_client_list_is_304(api, seed_invoices):
+    user_id = seed_invoices(1, client_count=3)
+    first = api.get('/api/clients/', user_id)
+    assert first.status_code == 200
+    assert len(first.get_json()['clients']) == 3
+    assert api.get('/api/clients/', user_id, first.headers['ETag']).status_code == 304
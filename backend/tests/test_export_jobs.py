@@ -0,0 +1,51 @@
+import os
+import pytest
+from flask import Flask
+from app.models import ExportJob
+from app.services.export_job_service import ExportJobService
+
+@pytest.fixture
+def app_context(db):
+    app = Flask(__name__)
+    app.config['EXPORT_RETENTION_HOURS'] = 24
+    with app.app_context():
+        yield
+
+@pytest.fixture
+def service(monkeypatch):
+    service = ExportJobService()
+    monkeypatch.setattr(service.export_service, 'count', lambda *args: 2)
+    monkeypatch.setattr(service.export_service, 'generate', lambda *args, **kwargs: iter([{'a': 1}, {'a': 2}]))
+    monkeypatch.setattr(service.export_service, 'encode', lambda rows, *args: (f"{row['a']}\n" for row in rows))
+    return service
+
+def open_fds():
+    return len(os.listdir('/proc/self/fd'))
+
+def test_identical_requests_share_a_running_job_only(app_context, service, seed_invoices, monkeypatch, tmp_path):
+    user_id = seed_invoices(1)
+    monkeypatch.setattr('app.services.export_job_service.artifact_storage.store', lambda path, name: os.remove(path) or str(tmp_path / 'out'))
+
+    job, created = service.get_or_create_job(user_id, 'revenue', 'csv')
+    same, joined = service.get_or_create_job(user_id, 'revenue', 'csv')
+    assert created and not joined and same.id == job.id
+
+    assert service.run(job.id).status == 'completed'
+
+    fresh, created = service.get_or_create_job(user_id, 'revenue', 'csv')
+    assert created and fresh.id != job.id
+
+def test_failed_run_closes_its_temp_file(app_context, service, seed_invoices, monkeypatch):
+    user_id = seed_invoices(1)
+    job, _ = service.get_or_create_job(user_id, 'revenue', 'csv')
+
+    def broken(*args):
+        raise RuntimeError('count failed')
+    monkeypatch.setattr(service.export_service, 'count', broken)
+
+    before = open_fds()
+    with pytest.raises(RuntimeError):
+        service.run(job.id)
+
+    assert open_fds() == before
+    assert ExportJob.objects(id=job.id).first().status == 'failed'
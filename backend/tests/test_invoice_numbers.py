@@ -0,0 +1,37 @@
+from app.models import User, InvoiceCounter
+from app.services.invoice_service import InvoiceService
+
+def make_user(**fields):
+    user = User(username='numbers', email='numbers@example.com', password_hash='-',
+                first_name='Num', last_name='Bers', **fields)
+    user.save()
+    return user
+
+def test_numbers_are_consecutive_and_next_number_follows_them(db):
+    user = make_user(invoice_prefix='INV')
+    service = InvoiceService()
+
+    assert service.next_invoice_number(user) == 'INV-0001'
+    assert service.reserve_invoice_numbers(user, 3) == ['INV-0001', 'INV-0002', 'INV-0003']
+    assert service.generate_invoice_number(user) == 'INV-0004'
+    assert service.next_invoice_number(user) == 'INV-0005'
+
+def test_new_counter_continues_after_existing_numbers_and_is_kept(db, seed_invoices, query_counter):
+    user = User.objects(id=seed_invoices(12)).first()
+    user.invoice_prefix = 'INV'
+    service = InvoiceService()
+
+    assert service.next_invoice_number(user) == 'INV-0013'
+    assert InvoiceCounter.objects(user=user.pk, prefix='INV').first().value == 12
+
+    query_counter.reset()
+    assert service.next_invoice_number(user) == 'INV-0013'
+    assert query_counter.total == 1
+    assert service.generate_invoice_number(user) == 'INV-0013'
+
+def test_to_dict_does_not_query(db, query_counter):
+    user = make_user()
+    query_counter.reset()
+
+    assert 'next_invoice_number' not in user.to_dict()
+    assert query_counter.total == 0
@@ -0,0 +1,47 @@
+import pytest
+from app.models import Invoice
+from app.services.invoice_service import InvoiceService
+
+@pytest.mark.parametrize('count', [1, 20, 100])
+def test_invoice_list_route_query_count_is_constant(api, seed_invoices, query_counter, count):
+    user_id = seed_invoices(count)
+    query_counter.reset()
+
+    response = api.get(f'/api/invoices/?per_page={count}&include_total=false', user_id)
+
+    # One find for the page and one `$in` find for its clients
+    assert response.status_code == 200
+    assert query_counter.total == 2
+    invoices = response.get_json()['invoices']
+    assert len(invoices) == count
+    assert all(invoice['client']['company_name'].startswith('Client ') for invoice in invoices)
+
+@pytest.mark.parametrize('count', [1, 20, 100])
+def test_serialize_invoice_rows_loads_clients_in_one_query(seed_invoices, query_counter, count):
+    user_id = seed_invoices(count)
+    rows = list(Invoice.objects(user=user_id).as_pymongo())
+    query_counter.reset()
+
+    invoices = InvoiceService().serialize_invoice_rows(rows)
+
+    assert query_counter.total == 1
+    assert [invoice['client']['id'] for invoice in invoices] == [str(row['client']) for row in rows]
+
+def test_serialize_invoice_rows_skips_clients_when_not_requested(seed_invoices, query_counter):
+    user_id = seed_invoices(10)
+    rows = list(Invoice.objects(user=user_id).as_pymongo())
+    query_counter.reset()
+
+    invoices = InvoiceService().serialize_invoice_rows(rows, ['invoice_number', 'status'])
+
+    assert query_counter.total == 0
+    assert set(invoices[0]) == {'id', 'invoice_number', 'status'}
+
+def test_list_queryset_reads_only_requested_fields(seed_invoices):
+    user_id = seed_invoices(3)
+
+    rows = list(InvoiceService().list_queryset(Invoice.objects(user=user_id), ['invoice_number', 'client']))
+
+    assert len(rows) == 3
+    assert {'_id', 'invoice_number', 'client', 'created_at'} <= set(rows[0])
+    assert 'items' not in rows[0]
@@ -0,0 +1,37 @@
+from decimal import Decimal
+import pytest
+from mongoengine import ValidationError
+from app.models import Invoice, RevenueRollup
+from app.services.rollup_service import revenue_rollup_service
+
+def seed_rollups():
+    for raw in Invoice.objects.as_pymongo():
+        revenue_rollup_service.apply(None, revenue_rollup_service.contribution(raw))
+
+def rollup_totals(user_id):
+    return sorted((row.status, float(row.total_amount)) for row in RevenueRollup.objects(user=user_id))
+
+def test_save_moves_the_rollup_contribution(db, seed_invoices):
+    user_id = seed_invoices(1)
+    seed_rollups()
+    invoice = Invoice.objects.first()
+
+    invoice.status = 'paid'
+    invoice.total_amount = Decimal('150.00')
+    invoice.save()
+
+    assert rollup_totals(user_id) == [('paid', 150.0), ('sent', 0.0)]
+
+def test_invalid_save_writes_nothing(db, seed_invoices):
+    user_id = seed_invoices(1)
+    seed_rollups()
+    invoice = Invoice.objects.first()
+
+    invoice.status = 'bogus'
+    invoice.total_amount = Decimal('999.00')
+    with pytest.raises(ValidationError):
+        invoice.save()
+
+    stored = Invoice.objects.as_pymongo().first()
+    assert (stored['status'], stored['total_amount']) == ('sent', 120.0)
+    assert rollup_totals(user_id) == [('sent', 120.0)]
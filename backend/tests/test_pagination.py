@@ -0,0 +1,49 @@
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from app.models import Invoice
+from app.services.pagination import encode_cursor, decode_cursor, paginate
+
+def walk(queryset, per_page, **kwargs):
+    """Follow next_cursor from the first page; returns the pages' invoice numbers"""
+    pages = []
+    cursor = ''
+    while cursor is not None:
+        documents, cursor = paginate(queryset, 'created_at', per_page, cursor=cursor, **kwargs)
+        pages.append([document.invoice_number for document in documents])
+    return pages
+
+def test_cursor_round_trip():
+    object_id = ObjectId()
+    value = datetime(2024, 3, 1, 12, 30, 15, 123000)
+    assert decode_cursor(encode_cursor(value, object_id)) == (value, object_id)
+    assert decode_cursor(encode_cursor('INV-0001', object_id)) == ('INV-0001', object_id)
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', 'e30', ''])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+def test_keyset_pages_cover_every_invoice_once(seed_invoices):
+    user_id = seed_invoices(23)
+    pages = walk(Invoice.objects(user=user_id), 5, descending=True)
+
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+    numbers = [number for page in pages for number in page]
+    # Newest first; seeded invoice i was created i minutes before the first
+    assert numbers == [f'INV-{i:04d}' for i in range(1, 24)]
+
+def test_keyset_full_last_page_has_no_cursor(seed_invoices):
+    user_id = seed_invoices(10)
+    assert [len(page) for page in walk(Invoice.objects(user=user_id), 5)] == [5, 5]
+
+@pytest.mark.parametrize('count, expected', [(10, None), (11, 'next')])
+def test_page_mode_cursor_only_when_more_rows(seed_invoices, count, expected):
+    user_id = seed_invoices(count)
+    documents, next_cursor = paginate(Invoice.objects(user=user_id), 'created_at', 5, page=2)
+
+    assert len(documents) == 5
+    assert (next_cursor is not None) == (expected == 'next')
+    if next_cursor:
+        following, _ = paginate(Invoice.objects(user=user_id), 'created_at', 5, cursor=next_cursor)
+        assert [document.invoice_number for document in following] == ['INV-0001']
@@ -0,0 +1,87 @@
+import os
+import stat
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from app.services.pdf_service import PdfService
+
+def make_service(root):
+    service = PdfService()
+    service.root = str(root)
+    service.redis = None
+    return service
+
+def test_store_is_safe_across_threads(tmp_path):
+    service = make_service(tmp_path)
+    errors = []
+
+    def write():
+        try:
+            for _ in range(50):
+                service.store('ab' * 20, b'%PDF-1.4 test')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    path = service.cache_path('ab' * 20)
+    assert errors == []
+    assert open(path, 'rb').read() == b'%PDF-1.4 test'
+    assert os.listdir(os.path.dirname(path)) == [os.path.basename(path)]
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+def test_iter_rendered_renders_on_worker_processes(tmp_path, db, seed_invoices):
+    service = make_service(tmp_path)
+    invoice_ids = service.batch_ids(seed_invoices(3))
+    db.users.update_many({}, {'$set': {'company_address': '1 Main St', 'company_phone': '-', 'company_website': '-'}})
+
+    stats = service.render_batch(invoice_ids, workers=2)
+
+    assert stats == {'rendered': 3, 'cached': 0, 'failed': 0}
+
+class BreakingPool:
+    """Stands in for a pool whose worker dies after `results` renders"""
+    created = 0
+
+    def __init__(self, results):
+        BreakingPool.created += 1
+        self.results = results
+
+    def map(self, fn, jobs, chunksize=1):
+        for key, _ in list(jobs)[:self.results]:
+            yield key, b'%PDF-1.4 test'
+        raise BrokenProcessPool('A process in the process pool was terminated abruptly')
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+def test_broken_pool_counts_as_failures_and_is_replaced(tmp_path, db, seed_invoices, monkeypatch):
+    service = make_service(tmp_path)
+    invoice_ids = service.batch_ids(seed_invoices(6))
+    BreakingPool.created = 0
+    monkeypatch.setattr(service, '_pool', lambda workers: BreakingPool(2))
+
+    rendered = list(service.iter_rendered(invoice_ids, workers=2, chunk_size=3))
+
+    assert [path is not None for _, path, _ in rendered] == [True, True, False, True, True, False]
+    assert BreakingPool.created == 3
+
+def test_accel_response_quotes_the_download_name(tmp_path):
+    from flask import Flask
+
+    service = make_service(tmp_path)
+    service.delivery = 'x-accel'
+    path = service.store('cd' * 20, b'%PDF-1.4 test')
+
+    with Flask(__name__).test_request_context():
+        plain = service.response(path, 'Q"1-0001.pdf')
+        accented = service.response(path, 'Facture-été-0001.pdf')
+
+    assert plain.headers['Content-Disposition'] == 'attachment; filename="Q\\"1-0001.pdf"'
+    assert accented.headers['Content-Disposition'] == (
+        "attachment; filename=Facture-ete-0001.pdf; filename*=UTF-8''Facture-%C3%A9t%C3%A9-0001.pdf"
+    )
+    assert accented.headers['X-Accel-Redirect'] == '/_pdf-cache/' + os.path.relpath(path, str(tmp_path))
@@ -0,0 +1,45 @@
+import json
+import random
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from app.models import Invoice, InvoiceItem
+from app.services.serializer_service import raw_serializer
+
+def item_rows(count, seed_value=7):
+    rng = random.Random(seed_value)
+    return [{
+        'description': f'Item {i}',
+        'quantity': rng.choice([1.0, 2.0, 3.0, 7.0, 0.5, 12.25]),
+        'unit_price': round(rng.uniform(0.01, 500), 2),
+        'tax_rate': rng.choice([0.0, 5.5, 10.0, 20.0]),
+        'discount_rate': rng.choice([0.0, 2.5, 5.0, 15.0])
+    } for i in range(count)]
+
+def invoice_row(items):
+    now = datetime(2024, 3, 1, 9, 30, 0, 250000)
+    return {
+        '_id': ObjectId(), 'invoice_number': 'INV-0001', 'user': ObjectId(), 'client': ObjectId(),
+        'issue_date': now, 'due_date': now, 'status': 'sent', 'currency': 'EUR', 'subtotal': 90.0,
+        'tax_total': 18.0, 'discount_total': 0.0, 'total_amount': 108.0, 'paid_amount': 0.0,
+        'balance_due': 108.0, 'shipping_fee': 0.0, 'handling_fee': 0.0, 'notes': 'Thanks',
+        'terms_conditions': '30 days', 'created_at': now, 'updated_at': now, 'items': items
+    }
+
+@pytest.mark.parametrize('quantity, unit_price, subtotal', [(3.0, 0.15, 0.45), (3.0, 0.1, 0.3), (7.0, 0.29, 2.03)])
+def test_item_totals_are_exact(quantity, unit_price, subtotal):
+    row = invoice_row([{'description': 'x', 'quantity': quantity, 'unit_price': unit_price,
+                        'tax_rate': 0.0, 'discount_rate': 0.0}])
+    item = raw_serializer.serialize('invoice', row, ['items'])['items'][0]
+    assert item['subtotal'] == subtotal
+    assert item['total'] == subtotal
+
+def test_items_match_invoice_item_to_dict():
+    rows = item_rows(500)
+    items = raw_serializer.serialize('invoice', invoice_row(rows), ['items'])['items']
+    assert items == [InvoiceItem._from_son(row).to_dict() for row in rows]
+
+def test_invoice_matches_to_dict_after_encoding():
+    row = invoice_row(item_rows(5))
+    expected = json.loads(json.dumps(Invoice._from_son(row).to_dict()))
+    assert json.loads(raw_serializer.dumps(raw_serializer.serialize('invoice', row))) == expected
@@ -20,7 +20,6 @@ export interface User {
   default_currency: string
   default_tax_rate: string
   invoice_prefix: string
-  next_invoice_number: string
   stripe_enabled: boolean
   paypal_enabled: boolean
 }